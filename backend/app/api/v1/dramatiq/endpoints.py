@@ -1,10 +1,18 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from fastapi.responses import StreamingResponse
 from loguru import logger
 
+from app.core.config import settings
+from app.core.job_keys import Granularity
+from app.db.redis_manager import redis_manager
+from app.services.dramatiq.dashboard_service import DashboardSnapshotService
 from app.services.dramatiq.dramatiq_service import DramatiqService
+from app.services.dramatiq.event_hub import JobEventHub
 from app.models.util.model import Message
-from app.utills.dependencies import admin_access, CheckScope, get_dramatiq_service
+from app.utills.dependencies import (
+    admin_access, CheckScope, get_dramatiq_service, get_dashboard_snapshot_service, get_job_event_hub,
+)
 
 dramatiq_router = APIRouter(tags=["Dramatiq Monitoring"], prefix="/dramatiq")
 app_admin = Depends(admin_access)
@@ -23,6 +31,12 @@ async def get_broker_info(
     return await dramatiq_service.get_broker_info()
 
 
+@dramatiq_router.get("/redis/pool", dependencies=[app_admin, read_jobs])
+async def get_redis_pool_stats() -> Dict[str, Any]:
+    """Get usage of the shared Redis connection pool"""
+    return redis_manager.pool_stats()
+
+
 @dramatiq_router.get("/queues", dependencies=[app_admin, read_jobs])
 async def get_all_queues(
     dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
@@ -31,6 +45,14 @@ async def get_all_queues(
     return await dramatiq_service.get_all_queues()
 
 
+@dramatiq_router.post("/queues/reconcile", dependencies=[app_admin, manage_jobs])
+async def reconcile_queues(
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+) -> List[str]:
+    """Rebuild the queue registry by scanning Redis for queue keys"""
+    return await dramatiq_service.reconcile_queues()
+
+
 @dramatiq_router.get("/queues/{queue_name}/stats", dependencies=[app_admin, read_jobs])
 async def get_queue_stats(
     queue_name: str = Path(..., description="Name of the queue"),
@@ -40,6 +62,39 @@ async def get_queue_stats(
     return await dramatiq_service.get_queue_stats(queue_name)
 
 
+@dramatiq_router.get("/actors/{actor_name}/stats", dependencies=[app_admin, read_jobs])
+async def get_actor_stats(
+    actor_name: str = Path(..., description="Name of the actor"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+) -> Dict[str, Any]:
+    """Get job counts by status for a specific actor"""
+    return await dramatiq_service.get_actor_stats(actor_name)
+
+
+@dramatiq_router.get("/stats/rollup", dependencies=[app_admin, read_jobs])
+async def get_stats_rollup(
+    granularity: Granularity = Query("minute", description="Bucket size: minute or hour"),
+    periods: int = Query(60, ge=1, description="Number of most recent buckets to return"),
+    queue_name: Optional[str] = Query(None, description="Only count jobs from this queue"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+) -> List[Dict[str, Any]]:
+    """Get job counts by status per minute or per hour"""
+    return await dramatiq_service.get_stats_rollup(granularity, periods, queue_name)
+
+
+@dramatiq_router.get("/latency", dependencies=[app_admin, read_jobs])
+async def get_latency(
+    windows: List[int] = Query([5, 15, 60], description="Sliding window lengths in minutes (max 120)"),
+    actor_name: Optional[str] = Query(None, description="Only include jobs of this actor"),
+    queue_name: Optional[str] = Query(None, description="Only include jobs from this queue"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+) -> Dict[str, Any]:
+    """Get queue-wait and run-time p50/p95/p99 over recent sliding windows"""
+    if not windows or min(windows) < 1:
+        raise HTTPException(status_code=400, detail="Windows must be at least 1 minute")
+    return await dramatiq_service.get_latency(windows, actor_name, queue_name)
+
+
 @dramatiq_router.get("/queues/{queue_name}/jobs", dependencies=[app_admin, read_jobs])
 async def get_queue_jobs(
     queue_name: str = Path(..., description="Name of the queue"),
@@ -74,13 +129,27 @@ async def get_job_by_id(
     return job.to_dict()
 
 
+@dramatiq_router.get("/jobs/{message_id}/progress", dependencies=[app_admin, read_jobs])
+async def get_job_progress(
+    message_id: str = Path(..., description="Message ID of the job"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+) -> Dict[str, Any]:
+    """Get the progress reported by a long-running job"""
+    progress = await dramatiq_service.get_job_progress(message_id)
+    if not progress:
+        raise HTTPException(status_code=404, detail="No progress reported for job")
+    return progress
+
+
 @dramatiq_router.post("/jobs/{message_id}/cancel", dependencies=[app_admin, manage_jobs])
 async def cancel_job(
     message_id: str = Path(..., description="Message ID of the job to cancel"),
+    remove_from_queue: bool = Query(False, description="Also delete the message from small queues"),
+    queue_name: Optional[str] = Query(None, description="Queue holding the job; defaults to the queue it was enqueued on"),
     dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
 ) -> Message:
     """Cancel a pending job"""
-    success = await dramatiq_service.cancel_job(message_id)
+    success = await dramatiq_service.cancel_job(message_id, remove_from_queue, queue_name)
     if not success:
         raise HTTPException(status_code=404, detail="Job not found or cannot be cancelled")
     return Message(message=f"Job {message_id} cancelled successfully")
@@ -110,43 +179,13 @@ async def clear_queue(
 
 @dramatiq_router.get("/dashboard", dependencies=[app_admin, read_jobs])
 async def get_dashboard_data(
-    dramatiq_service: DramatiqService = Depends(get_dramatiq_service)
+    refresh: bool = Query(False, description="Rebuild the snapshot instead of serving the cached one"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service),
+    snapshot_service: DashboardSnapshotService = Depends(get_dashboard_snapshot_service)
 ) -> Dict[str, Any]:
     """Get dashboard data with overview of all queues and jobs"""
     try:
-        # Get broker info
-        broker_info = await dramatiq_service.get_broker_info()
-
-        # Get all queues
-        queues = await dramatiq_service.get_all_queues()
-
-        # Get stats for each queue
-        queue_stats = []
-        total_stats = {
-            "total_jobs": 0,
-            "pending_jobs": 0,
-            "completed_jobs": 0,
-            "failed_jobs": 0,
-            "running_jobs": 0
-        }
-
-        for queue_name in queues:
-            stats = await dramatiq_service.get_queue_stats(queue_name)
-            queue_stats.append(stats)
-
-            # Aggregate totals
-            total_stats["total_jobs"] += stats["total_jobs"]
-            total_stats["pending_jobs"] += stats["pending_jobs"]
-            total_stats["completed_jobs"] += stats["completed_jobs"]
-            total_stats["failed_jobs"] += stats["failed_jobs"]
-            total_stats["running_jobs"] += stats["running_jobs"]
-
-        return {
-            "broker_info": broker_info,
-            "total_stats": total_stats,
-            "queue_stats": queue_stats,
-            "queues": queues
-        }
+        return await snapshot_service.get_snapshot(dramatiq_service, force_refresh=refresh)
 
     except Exception as e:
         logger.error(f"Failed to get dashboard data: {e}")
@@ -165,4 +204,28 @@ async def dramatiq_health_check(
         return {"status": "healthy", "service": "dramatiq_monitoring"}
     except Exception as e:
         logger.error(f"Dramatiq health check failed: {e}")
-        raise HTTPException(status_code=503, detail="Dramatiq monitoring service unhealthy")
\ No newline at end of file
+        raise HTTPException(status_code=503, detail="Dramatiq monitoring service unhealthy")
+
+
+@dramatiq_router.get("/events", dependencies=[app_admin, read_jobs])
+async def stream_job_events(
+    queue_name: Optional[str] = Query(None, description="Only stream events for this queue"),
+    actor_name: Optional[str] = Query(None, description="Only stream events for this actor"),
+    dramatiq_service: DramatiqService = Depends(get_dramatiq_service),
+    event_hub: JobEventHub = Depends(get_job_event_hub)
+) -> StreamingResponse:
+    """Stream job lifecycle events as Server-Sent Events; an `interrupted` event means some may have been missed"""
+    subscriber = event_hub.subscribe(dramatiq_service.redis_client, queue_name, actor_name)
+
+    async def event_stream():
+        try:
+            async for chunk in event_hub.stream(subscriber, settings.dramatiq_event_heartbeat_seconds):
+                yield chunk
+        finally:
+            await event_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,8 +1,8 @@
 from typing import List
 from fastapi import APIRouter, Query, Depends, Path
 from app.models.role.model import RoleOut, RoleBase
-from app.models.user.model import User
-from app.models.util.model import Message
+from app.models.user.model import User, UserSelection
+from app.models.util.model import Message, BulkUpdateResult, BatchLookupRequest, BatchLookupResult
 from app.services.role.role_service import RoleService
 from app.utills.dependencies import CheckScope, admin_access, get_role_service
 
@@ -30,6 +30,14 @@ async def get_role_by_id(
     return await role_service.get_role_by_id(role_id)
 
 
+@role_router.post("/by_ids", response_model=BatchLookupResult[RoleOut], dependencies=[manage_roles])
+async def get_roles_by_ids(
+        request: BatchLookupRequest,
+        role_service: RoleService = Depends(get_role_service)
+) -> BatchLookupResult[RoleOut]:
+    return await role_service.lookup_roles_by_ids(request.keys)
+
+
 @role_router.post("/create", response_model=RoleOut, dependencies=[manage_roles])
 async def create_role(
         role_data: RoleBase,
@@ -54,3 +62,23 @@ async def delete_role(
         role_service: RoleService = Depends(get_role_service)
 ) -> Message:
     return await role_service.delete_role(role_id)
+
+
+@role_router.post("/{role_id}/assign", response_model=BulkUpdateResult, dependencies=[manage_roles])
+async def assign_role(
+        selection: UserSelection,
+        role_id: str = Path(..., description="Role ID"),
+        role_service: RoleService = Depends(get_role_service)
+) -> BulkUpdateResult:
+    """Assign a role to a list of users or to every user matching a filter"""
+    return await role_service.assign_role(role_id, selection)
+
+
+@role_router.post("/{role_id}/revoke", response_model=BulkUpdateResult, dependencies=[manage_roles])
+async def revoke_role(
+        selection: UserSelection,
+        role_id: str = Path(..., description="Role ID"),
+        role_service: RoleService = Depends(get_role_service)
+) -> BulkUpdateResult:
+    """Revoke a role from a list of users or from every user matching a filter"""
+    return await role_service.revoke_role(role_id, selection)
@@ -5,8 +5,9 @@ import uuid
 from fastapi import APIRouter, Depends, HTTPException, Body, Form, Request, BackgroundTasks, Path
 
 from app.core.config import settings
-from app.models.user.model import UserAuth, UpdatePassword, UserBase, APIKey, UpdateAPIKey, UserOut, UserUpdateRequest, CreateAPIKeyRequest, CreateAPIKey
-from app.models.util.model import Message
+from app.models.user.model import UserAuth, UpdatePassword, UserBase, APIKey, UpdateAPIKey, UserOut, UserUpdateRequest, CreateAPIKeyRequest, CreateAPIKey, \
+    BulkEmailRequest
+from app.models.util.model import Message, BatchLookupRequest, BatchLookupResult
 from app.services.user.user_service import UserService, MyUserService
 from app.tasks.background_tasks import send_reset_password_email_task
 from app.utills.dependencies import admin_access, CheckScope, get_user_service, get_self_user_service, \
@@ -62,6 +63,24 @@ async def by_email(
     return await user_service.get_user_by_email(email)
 
 
+@user_router.post("/by_ids", dependencies=[app_admin, manage_users])
+async def by_ids(
+        request: BatchLookupRequest,
+        user_service: UserService = Depends(get_user_service),
+) -> BatchLookupResult[UserBase]:
+    """Admin endpoint to retrieve many users' profiles by id in one request"""
+    return await user_service.lookup_users_by_ids(request.keys)
+
+
+@user_router.post("/by_emails", dependencies=[app_admin, manage_users])
+async def by_emails(
+        request: BatchLookupRequest,
+        user_service: UserService = Depends(get_user_service),
+) -> BatchLookupResult[UserBase]:
+    """Admin endpoint to retrieve many users' profiles by email in one request"""
+    return await user_service.lookup_users_by_emails(request.keys)
+
+
 @user_router.put("/update", dependencies=[app_admin, manage_users])
 async def update_user(
         user_update: UserUpdateRequest,
@@ -149,6 +168,15 @@ async def reset_password(
     return await user_service.reset_password(new_password, token.sub)
 
 
+@user_router.post("/bulk_email", dependencies=[app_admin, manage_users])
+async def send_bulk_email(
+    request: BulkEmailRequest,
+    user_service: UserService = Depends(get_user_service),
+) -> Message:
+    """Email every selected user as one background job; track it at /dramatiq/jobs/{message_id}/progress"""
+    return await user_service.send_bulk_email(request)
+
+
 @user_router.post("/test_email_task", dependencies=[app_admin])
 async def test_email_task(
     email: str = Body(...),
@@ -3,11 +3,6 @@ from app.models.user.model import User
 from app.services.auth.auth_service import AuthService
 from app.services.email.email import EmailService
 
-async def validate_user_does_not_exist(email: str):
-    if _ := await User.by_email(email):
-        raise HTTPException(409, "User already exists")
-
-
 async def validate_user_doesnt_need_verification(user: User):
     if not user:
         raise HTTPException(404, "No account found")
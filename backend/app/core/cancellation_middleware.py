@@ -0,0 +1,42 @@
+"""
+Custom Dramatiq middleware that skips messages cancelled from the monitoring API.
+"""
+import time
+
+import redis
+from dramatiq import Message, Middleware
+from dramatiq.middleware import SkipMessage
+from loguru import logger
+
+from app.core.job_keys import JobKeys
+
+
+class CancellationMiddleware(Middleware):
+    """
+    Skips messages whose ids are in the cancellation set.
+
+    Cancelling only adds the message id to a sorted set scored by its expiry, so the API never has to
+    find the message inside its queue. Workers drop the message when they pick it up.
+    """
+
+    def __init__(self, redis_url: str, namespace: str):
+        """
+        Args:
+            redis_url: Redis connection URL
+            namespace: Redis key namespace
+        """
+        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        self.keys = JobKeys(namespace)
+
+    def before_process_message(self, broker, message: Message) -> None:
+        try:
+            expires_at = self.redis_client.zscore(self.keys.cancelled_set(), message.message_id)
+        except Exception as e:
+            # Never block processing on a failed lookup; worst case a cancelled job still runs
+            logger.error(f"Failed to check cancellation for job {message.message_id}: {e}")
+            return
+
+        if expires_at is not None and expires_at > time.time():
+            logger.info(f"Skipping cancelled job {message.message_id} ({message.actor_name})")
+            message.options["cancelled"] = True
+            raise SkipMessage(f"Job {message.message_id} was cancelled")
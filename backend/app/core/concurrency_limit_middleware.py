@@ -0,0 +1,149 @@
+"""
+Custom Dramatiq middleware that caps how many messages of an actor run at once across all workers.
+"""
+import threading
+from dataclasses import dataclass
+
+import redis
+from dramatiq import Message, Middleware
+from dramatiq.common import compute_backoff
+from loguru import logger
+
+from app.core.deferral import defer_message
+from app.core.job_keys import JobKeys
+
+try:
+    from datadog import statsd
+    DATADOG_AVAILABLE = True
+except ImportError:
+    DATADOG_AVAILABLE = False
+
+# Drops expired leases, then adds the holder if the semaphore has a free slot. Returns 1 when the
+# slot was taken and 0 when the semaphore is full. Leases expire on the Redis clock, so a worker
+# that dies while holding one frees its slot after lease_ms.
+ACQUIRE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local lease_ms = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], ARGV[3]) or redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now + lease_ms, ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], lease_ms)
+    return 1
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class ConcurrencyLimit:
+    key: str
+    limit: int
+    lease_ms: int
+
+
+class ConcurrencyLimitMiddleware(Middleware):
+    """
+    Limits how many messages of an actor run at the same time across all workers.
+
+    Actors opt in with options, e.g. ``@dramatiq.actor(max_concurrency=2)``. Actors sharing a
+    ``concurrency_key`` share one semaphore. Each running message holds a lease in a Redis sorted set
+    scored by its expiry (``concurrency_lease_ms``, default lease_ms), released when the message
+    finishes; a lease left by a worker that died expires on its own.
+
+    A message that finds the semaphore full is deferred back to the broker with exponential backoff
+    on its deferral count, instead of occupying a worker thread while it waits.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        namespace: str,
+        lease_ms: int = 660000,
+        min_backoff_ms: int = 1000,
+        max_backoff_ms: int = 60000,
+    ):
+        """
+        Args:
+            redis_url: Redis connection URL
+            namespace: Redis key namespace
+            lease_ms: Default lease of a running message; keep it above the TimeLimit so a slow message
+                never loses its slot while it still runs
+            min_backoff_ms: Delay before a message waiting for a slot is first retried
+            max_backoff_ms: Longest delay between retries of a message waiting for a slot
+        """
+        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        self.keys = JobKeys(namespace)
+        self.lease_ms = lease_ms
+        self.min_backoff_ms = min_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        self._script = self.redis_client.register_script(ACQUIRE_SCRIPT)
+        self._limits: dict[str, ConcurrencyLimit] = {}
+        # Semaphore key held by each message this process is running
+        self._held: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def actor_options(self):
+        return {"max_concurrency", "concurrency_key", "concurrency_lease_ms"}
+
+    def after_declare_actor(self, broker, actor) -> None:
+        limit = actor.options.get("max_concurrency")
+        if limit is None:
+            return
+        if limit < 1:
+            raise ValueError(f"max_concurrency of {actor.actor_name} must be at least 1")
+        self._limits[actor.actor_name] = ConcurrencyLimit(
+            key=actor.options.get("concurrency_key", actor.actor_name),
+            limit=limit,
+            lease_ms=actor.options.get("concurrency_lease_ms", self.lease_ms),
+        )
+
+    def before_process_message(self, broker, message: Message) -> None:
+        limit = self._limits.get(message.actor_name)
+        if limit is None:
+            return
+
+        semaphore_key = self.keys.semaphore(limit.key)
+        try:
+            acquired = self._script(keys=[semaphore_key], args=[limit.limit, limit.lease_ms, message.message_id])
+        except Exception as e:
+            # Never block processing on a failed lookup; worst case the limit is briefly exceeded
+            logger.error(f"Failed to acquire concurrency slot {limit.key} for job {message.message_id}: {e}")
+            return
+
+        if acquired:
+            with self._lock:
+                self._held[message.message_id] = semaphore_key
+            return
+
+        _, backoff_ms = compute_backoff(
+            message.options.get("deferrals", 0), factor=self.min_backoff_ms, max_backoff=self.max_backoff_ms
+        )
+        if DATADOG_AVAILABLE:
+            statsd.increment(
+                'dramatiq.concurrency_limit.deferred',
+                tags=[f'actor:{message.actor_name}', f'concurrency_limit:{limit.key}'],
+            )
+        logger.debug(f"Concurrency limit {limit.key} full, deferring job {message.message_id} by {backoff_ms}ms")
+        # compute_backoff already adds jitter
+        defer_message(broker, message, backoff_ms, f"concurrency_limit:{limit.key}", jitter=0)
+
+    def _release(self, message: Message) -> None:
+        with self._lock:
+            semaphore_key = self._held.pop(message.message_id, None)
+        if semaphore_key is None:
+            return
+        try:
+            self.redis_client.zrem(semaphore_key, message.message_id)
+        except Exception as e:
+            # The lease expires on its own
+            logger.error(f"Failed to release concurrency slot for job {message.message_id}: {e}")
+
+    def after_process_message(self, broker, message: Message, *, result=None, exception=None) -> None:
+        self._release(message)
+
+    def after_skip_message(self, broker, message: Message) -> None:
+        # A later middleware, such as the rate limiter, may skip a message after it took a slot
+        self._release(message)
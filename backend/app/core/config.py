@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import List
+from typing import List, Literal, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -30,6 +30,22 @@ class Settings(BaseSettings):
         smtp_port: The SMTP provider port, default is 587
         smtp_host: The SMTP host
         email_reset_token_expire_minutes: The email token expiry in minutes, defaults to 60 minutes
+        smtp_timeout: Seconds before an SMTP connect or command times out
+        smtp_pool_max_size: Maximum SMTP connections each process keeps open
+        smtp_pool_idle_timeout: Seconds an unused pooled SMTP connection is kept before being closed
+        smtp_async_max_concurrency: Maximum concurrent async SMTP sends (and connections) per event loop
+        bulk_email_chunk_size: Recipients per chunk job when sending a bulk email
+        email_template_bytecode_cache_dir: Directory for compiled email template bytecode, shared across processes; unset to disable
+        email_attachment_store: Where email attachments are kept: gridfs (default) or local
+        email_attachment_dir: Directory for the local attachment store
+        email_attachment_max_bytes: Largest total attachment size per email; a send holds about four times this in memory
+        email_rate_limit: Emails per period sent across all workers, e.g. "50/s", matching the SMTP provider's limit
+        email_bulk_rate_limit: Share of email_rate_limit bulk emails may use, leaving the rest for interactive emails
+        outbox_batch_size: Outbox messages the relay claims and marks per batch
+        outbox_poll_interval: Seconds the outbox relay waits between polls when not notified
+        outbox_claim_timeout: Seconds before messages claimed by a stopped relay can be claimed again
+        outbox_retention_seconds: Seconds relayed outbox messages are kept before Mongo expires them
+        outbox_max_attempts: Attempts to enqueue an outbox message before it is marked failed
         refresh_token_expire_minutes: The reset token expiry in minutes, defaults to 60 minutes
         token_expire_minutes: The token expiry in minutes, defaults to 30 minutes
         secret_key: The key used to hash passwords and psks
@@ -39,6 +55,25 @@ class Settings(BaseSettings):
         master_psk: The app master password
         google_client_id: Google OAuth client ID
         magic_link_refresh_seconds: Magic link refresh interval in seconds
+        bulk_update_chunk_size: Number of users written per update_many chunk in bulk operations
+        batch_lookup_max_keys: Maximum number of keys accepted by the batch lookup endpoints
+        redis_max_connections: Size of the shared async Redis connection pool
+        dramatiq_job_retention_seconds: Seconds tracked job records and completed-job index entries are kept
+        dramatiq_max_completed_jobs: Maximum number of entries kept in the completed-job index
+        dramatiq_completed_buckets: Index completed jobs in hourly sets that expire whole instead of one trimmed set
+        dramatiq_cancellation_ttl: Seconds a job cancellation stays in effect
+        dramatiq_dashboard_cache_seconds: Seconds a computed dashboard snapshot is served before rebuilding
+        dramatiq_cancel_scan_max_length: Longest queue the optional removal on cancel will scan with LREM
+        dramatiq_event_buffer_size: Job events buffered per live event stream client before the oldest are dropped
+        dramatiq_event_heartbeat_seconds: Seconds between keep-alive comments on an idle event stream
+        dramatiq_rate_limit_max_inline_wait_ms: Longest rate limit wait a worker sleeps through before deferring the message
+        dramatiq_concurrency_lease_ms: Default lease of a concurrency-limited running job; keep above the 10 minute TimeLimit
+        dramatiq_concurrency_min_backoff_ms: First delay before a job waiting for a concurrency slot is retried
+        dramatiq_concurrency_max_backoff_ms: Longest delay between retries of a job waiting for a concurrency slot
+        maintenance_max_concurrency: Maintenance jobs (token cleanup, role cleanup) allowed to run at once across all workers
+        dramatiq_worker_topology: JSON list of worker pools ({"name", "queues", "processes", "threads"}); unset for the default topology
+        redis_pool_timeout: Seconds to wait for a free pooled Redis connection before failing
+        redis_socket_timeout: Seconds before a Redis connect or command times out
     """
     app_name: str = "your_backend_app"
     app_domain: str = "http://localhost:5151"
@@ -57,6 +92,22 @@ class Settings(BaseSettings):
     smtp_port: int = 587
     smtp_host: str = "smtp.sendgrid.net"
     email_reset_token_expire_minutes: int = 60
+    smtp_timeout: int = 30
+    smtp_pool_max_size: int = 4
+    smtp_pool_idle_timeout: int = 60
+    smtp_async_max_concurrency: int = 20
+    bulk_email_chunk_size: int = 200
+    email_template_bytecode_cache_dir: Optional[str] = None
+    email_attachment_store: Literal["gridfs", "local"] = "gridfs"
+    email_attachment_dir: str = "email-attachments"
+    email_attachment_max_bytes: int = 10 * 1024 * 1024
+    email_rate_limit: str = "50/s"
+    email_bulk_rate_limit: str = "40/s"
+    outbox_batch_size: int = 100
+    outbox_poll_interval: float = 1.0
+    outbox_claim_timeout: int = 60
+    outbox_retention_seconds: int = 86400
+    outbox_max_attempts: int = 5
     refresh_token_expire_minutes: int = 60
     token_expire_minutes: int = 30
     secret_key: str = "change_me"
@@ -69,9 +120,28 @@ class Settings(BaseSettings):
     redis_url: str = "redis://localhost:6379"
     dramatiq_broker_url: str = "redis://localhost:6379"
     dramatiq_namespace: str = "your_backend_app"
+    dramatiq_job_retention_seconds: int = 86400
+    dramatiq_max_completed_jobs: int = 10000
+    dramatiq_completed_buckets: bool = False
+    dramatiq_cancellation_ttl: int = 86400
+    dramatiq_dashboard_cache_seconds: float = 3.0
+    dramatiq_cancel_scan_max_length: int = 1000
+    dramatiq_event_buffer_size: int = 100
+    dramatiq_event_heartbeat_seconds: float = 15.0
+    dramatiq_rate_limit_max_inline_wait_ms: int = 50
+    dramatiq_concurrency_lease_ms: int = 660000
+    dramatiq_concurrency_min_backoff_ms: int = 1000
+    dramatiq_concurrency_max_backoff_ms: int = 60000
+    maintenance_max_concurrency: int = 2
+    dramatiq_worker_topology: Optional[str] = None
+    redis_max_connections: int = 20
+    redis_pool_timeout: int = 5
+    redis_socket_timeout: int = 5
     cors_origins: str = "http://localhost:3000,http://localhost:5173"  # Comma-separated origins
     db_max_pool_size: int = 10
     db_min_pool_size: int = 1
+    bulk_update_chunk_size: int = 1000
+    batch_lookup_max_keys: int = 500
     # Datadog Configuration
     dd_service: str = "api_starter"  # Datadog service name
     dd_env: str = "dev"  # Datadog environment (dev/staging/prod)
@@ -0,0 +1,29 @@
+"""
+Deferring Dramatiq messages that are not allowed to run yet.
+
+Rate limits and concurrency limits hand a message back to the broker with a delay instead of failing
+it or holding a worker thread while it waits, so deferrals never count against max_retries.
+"""
+import random
+
+from dramatiq import Broker, Message
+from dramatiq.middleware import SkipMessage
+
+
+def defer_message(broker: Broker, message: Message, delay_ms: int, reason: str, jitter: float = 0.1) -> None:
+    """
+    Re-enqueue the message after delay_ms and skip the current delivery.
+
+    The re-enqueued copy carries ``deferred_by`` and a ``deferrals`` count, which JobTrackerMiddleware
+    records on the job. The current delivery is flagged ``deferred`` so the skip is not tracked as a
+    terminal status, and does not store a result, which would otherwise be read before the real one.
+    Up to jitter * delay_ms is added so deferred messages do not all return at once.
+    """
+    delay_ms = int(delay_ms + random.uniform(0, jitter * delay_ms))
+    broker.enqueue(
+        message.copy(options={"deferred_by": reason, "deferrals": message.options.get("deferrals", 0) + 1}),
+        delay=delay_ms,
+    )
+    message.options["deferred"] = True
+    message.options["store_results"] = False
+    raise SkipMessage(f"Job {message.message_id} deferred by {reason} for {delay_ms}ms")
@@ -4,19 +4,24 @@ import dramatiq
 from dramatiq import Broker, Worker
 from dramatiq.asyncio import EventLoopThread, set_event_loop_thread
 from dramatiq.brokers.redis import RedisBroker
-from dramatiq.middleware import AgeLimit, TimeLimit, Retries, AsyncIO
+from dramatiq.middleware import AgeLimit, TimeLimit, Retries, AsyncIO, CurrentMessage, default_middleware
 from dramatiq.results.backends import RedisBackend
 from dramatiq.results import Results
 from loguru import logger
 
 from app.core.config import settings
+from app.core.cancellation_middleware import CancellationMiddleware
+from app.core.concurrency_limit_middleware import ConcurrencyLimitMiddleware
 from app.core.job_tracker_middleware import JobTrackerMiddleware
+from app.core.rate_limit_middleware import RateLimitMiddleware
 
 
 async def async_startup():
     from app.db.db_manager import db_manager
+    from app.services.email.templates import email_template_renderer
     logger.info("Starting Beanie in Async Dramatiq Worker")
     await db_manager.connect()
+    email_template_renderer.warm()
 
 
 class CustomAsyncIO(AsyncIO):
@@ -30,17 +35,47 @@ class CustomAsyncIO(AsyncIO):
 
 
 try:
-    broker = RedisBroker(url=settings.dramatiq_broker_url, namespace=settings.dramatiq_namespace)
+    # RedisBroker already installs AgeLimit, TimeLimit and Retries; configure those instances instead of
+    # adding second copies, which would apply every limit and retry twice
+    configured_defaults = {
+        AgeLimit: AgeLimit(max_age=3600000),  # 1 hour
+        TimeLimit: TimeLimit(time_limit=600000),  # 10 minutes
+        Retries: Retries(max_retries=3),
+    }
+    broker = RedisBroker(
+        url=settings.dramatiq_broker_url,
+        namespace=settings.dramatiq_namespace,
+        middleware=[configured_defaults.get(middleware) or middleware() for middleware in default_middleware],
+    )
     result_backend = RedisBackend(url=settings.dramatiq_broker_url, namespace=f"{settings.dramatiq_namespace}-results")
     job_tracker = JobTrackerMiddleware(
         redis_url=settings.dramatiq_broker_url,
         namespace=settings.dramatiq_namespace,
-        ttl=86400  # 24 hours
+        ttl=settings.dramatiq_job_retention_seconds,
+        max_completed=settings.dramatiq_max_completed_jobs,
+        bucketed=settings.dramatiq_completed_buckets,
+    )
+    rate_limiter = RateLimitMiddleware(
+        redis_url=settings.dramatiq_broker_url,
+        namespace=settings.dramatiq_namespace,
+        max_inline_wait_ms=settings.dramatiq_rate_limit_max_inline_wait_ms,
     )
-    broker.add_middleware(AgeLimit(max_age=3600000))  # 1 hour
-    broker.add_middleware(TimeLimit(time_limit=600000))  # 10 minutes
-    broker.add_middleware(Retries(max_retries=3))
     broker.add_middleware(CustomAsyncIO())
+    broker.add_middleware(CurrentMessage())
+    broker.add_middleware(CancellationMiddleware(
+        redis_url=settings.dramatiq_broker_url,
+        namespace=settings.dramatiq_namespace,
+    ))
+    # After cancellation, so cancelled jobs never take a slot or a token. Slots are taken before
+    # tokens: a job deferred for a full semaphore would otherwise waste the token it took.
+    broker.add_middleware(ConcurrencyLimitMiddleware(
+        redis_url=settings.dramatiq_broker_url,
+        namespace=settings.dramatiq_namespace,
+        lease_ms=settings.dramatiq_concurrency_lease_ms,
+        min_backoff_ms=settings.dramatiq_concurrency_min_backoff_ms,
+        max_backoff_ms=settings.dramatiq_concurrency_max_backoff_ms,
+    ))
+    broker.add_middleware(rate_limiter)
     broker.add_middleware(Results(backend=result_backend))
     broker.add_middleware(job_tracker)
     dramatiq.set_broker(broker)
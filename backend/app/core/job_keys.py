@@ -0,0 +1,137 @@
+"""
+Redis key layout for Dramatiq job tracking.
+
+JobTrackerMiddleware writes these keys from the workers and DramatiqService reads them from the API,
+so both sides build them here. Queue keys mirror the layout RedisBroker's dispatch script writes.
+"""
+from bisect import bisect_left
+from datetime import datetime
+from typing import Literal, Optional
+
+from dramatiq.common import q_name
+
+Granularity = Literal["minute", "hour"]
+LatencyKind = Literal["wait", "run"]
+
+BUCKET_SECONDS: dict[str, int] = {
+    "minute": 60,
+    "hour": 3600,
+}
+
+# How long rollup buckets are kept, in seconds
+ROLLUP_RETENTION: dict[str, int] = {
+    "minute": 2 * 3600,
+    "hour": 7 * 86400,
+}
+
+# Upper bounds, in milliseconds, of the latency histogram buckets. A final overflow bucket
+# (index len(LATENCY_BOUNDS_MS)) holds everything slower than the last bound.
+LATENCY_BOUNDS_MS: tuple[int, ...] = (
+    5, 10, 25, 50, 100, 250, 500,
+    1_000, 2_500, 5_000, 10_000, 30_000, 60_000, 300_000, 900_000, 3_600_000,
+)
+
+# Latency histograms are kept per minute, for the same time as minute rollups
+LATENCY_RETENTION = ROLLUP_RETENTION["minute"]
+
+
+def latency_bucket(duration_ms: float) -> int:
+    """Index of the histogram bucket a duration falls into"""
+    return bisect_left(LATENCY_BOUNDS_MS, duration_ms)
+
+
+class JobKeys:
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+
+    def queue(self, queue_name: str = "default") -> str:
+        """RedisBroker list of the message ids waiting on a queue"""
+        return f"{self.namespace}:{queue_name}"
+
+    def queue_messages(self, queue_name: str = "default") -> str:
+        """RedisBroker hash of message id -> encoded message for a queue"""
+        return f"{self.namespace}:{queue_name}.msgs"
+
+    def queue_messages_pattern(self) -> str:
+        """SCAN pattern matching every queue's message hash, used only to reconcile the registry"""
+        return f"{self.namespace}:*.msgs"
+
+    def queue_name_from_messages_key(self, key: str) -> Optional[str]:
+        """Canonical queue name of a message hash key; delay and dead-letter queues map to their queue"""
+        name = key.removeprefix(f"{self.namespace}:").removesuffix(".msgs")
+        # Other keys in the namespace, such as job records, are never message hashes of a queue
+        return None if ":" in name else q_name(name)
+
+    def queue_registry(self) -> str:
+        """Set of known queue names"""
+        return f"{self.namespace}:queues"
+
+    def message(self, message_id: str) -> str:
+        return f"{self.namespace}:message:{message_id}"
+
+    def result(self, message_id: str) -> str:
+        return f"{self.namespace}:result:{message_id}"
+
+    def job(self, message_id: str) -> str:
+        """Tracked job record"""
+        return f"{self.namespace}:job:{message_id}"
+
+    def job_pattern(self) -> str:
+        """Pattern matching every job record, along with the progress hashes"""
+        return f"{self.namespace}:job:*"
+
+    def job_records_version(self) -> str:
+        """Format version of the job records, set once legacy records are migrated"""
+        return f"{self.namespace}:jobs:version"
+
+    def progress(self, message_id: str) -> str:
+        """Progress reported by a running job"""
+        return f"{self.namespace}:job:{message_id}:progress"
+
+    def completed_set(self) -> str:
+        """Sorted set of finished job ids scored by completion time"""
+        return f"{self.namespace}:jobs:completed"
+
+    def completed_bucket(self, bucket: int) -> str:
+        """Hourly sorted set of finished job ids, used instead of completed_set in bucketed mode"""
+        return f"{self.namespace}:jobs:completed:{bucket}"
+
+    def cancelled_set(self) -> str:
+        """Sorted set of cancelled job ids scored by when the cancellation expires"""
+        return f"{self.namespace}:jobs:cancelled"
+
+    def rate_limit(self, limit_key: str) -> str:
+        """Hash holding the token bucket of a rate limit shared by one or more actors"""
+        return f"{self.namespace}:ratelimit:{limit_key}"
+
+    def semaphore(self, concurrency_key: str) -> str:
+        """Sorted set of message ids holding a concurrency slot, scored by lease expiry"""
+        return f"{self.namespace}:semaphore:{concurrency_key}"
+
+    def queue_stats(self, queue_name: str) -> str:
+        """Hash of job counts by status for a queue"""
+        return f"{self.namespace}:stats:queue:{queue_name}"
+
+    def actor_stats(self, actor_name: str) -> str:
+        """Hash of job counts by status for an actor"""
+        return f"{self.namespace}:stats:actor:{actor_name}"
+
+    def rollup(self, granularity: Granularity, bucket: int) -> str:
+        """Hash of job counts by status (and queue:status) for one time bucket"""
+        return f"{self.namespace}:stats:{granularity}:{bucket}"
+
+    def events_channel(self) -> str:
+        """Pub/sub channel job lifecycle events are published on"""
+        return f"{self.namespace}:events"
+
+    def latency(self, kind: LatencyKind, bucket: int) -> str:
+        """Hash of latency histogram counts for one minute, with fields queue:actor:bucket_index"""
+        return f"{self.namespace}:latency:{kind}:{bucket}"
+
+    @staticmethod
+    def latency_field(queue_name: str, actor_name: str, bucket_index: int) -> str:
+        return f"{queue_name}:{actor_name}:{bucket_index}"
+
+    @staticmethod
+    def bucket(granularity: Granularity, at: datetime) -> int:
+        return int(at.timestamp()) // BUCKET_SECONDS[granularity]
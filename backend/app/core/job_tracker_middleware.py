@@ -1,58 +1,396 @@
 """
-Custom Dramatiq middleware to track job completion for dashboard monitoring.
+Custom Dramatiq middleware to track the job lifecycle for dashboard monitoring.
 """
 import json
+import time
 from datetime import datetime, UTC
 from typing import Any, Optional
 import redis
-from dramatiq import Message, Middleware
+from dramatiq import ActorNotFound, Message, Middleware
+from dramatiq.common import current_millis, q_name
+from dramatiq.middleware import Retries
 from loguru import logger
 
+from app.core.job_keys import (
+    JobKeys, LatencyKind, BUCKET_SECONDS, LATENCY_RETENTION, ROLLUP_RETENTION, latency_bucket,
+)
+
 try:
     from datadog import statsd
     DATADOG_AVAILABLE = True
 except ImportError:
     DATADOG_AVAILABLE = False
 
+# Job records are hashes from version 2; version 1 stored each record as a JSON string
+JOB_RECORDS_VERSION = "2"
+
 
 class JobTrackerMiddleware(Middleware):
-    """Tracks job lifecycle events in Redis for monitoring dashboard"""
+    """
+    Tracks job lifecycle events in Redis for monitoring dashboard.
+
+    Each job is a hash at ``{ns}:job:{message_id}`` that moves through pending, running,
+    retrying and a terminal status (completed, failed, cancelled, skipped). Every event is
+    written with a single MULTI/EXEC pipeline together with its counters.
+
+    Queue-wait (from landing on the normal queue until start) and run time are recorded into per-minute
+    fixed-bucket histograms keyed by queue and actor.
+
+    Each event is also published on the ``{ns}:events`` channel for live dashboards.
 
-    def __init__(self, redis_url: str, namespace: str, ttl: int = 86400):
+    Messages deferred by a rate or concurrency limit stay pending, with ``deferred_by`` and
+    ``deferrals`` on the job record, instead of being recorded as skipped.
+    """
+
+    def __init__(
+        self,
+        redis_url: str,
+        namespace: str,
+        ttl: int = 86400,
+        max_completed: int = 10000,
+        bucketed: bool = False,
+    ):
         """
         Args:
             redis_url: Redis connection URL
             namespace: Redis key namespace
-            ttl: Time-to-live for job records in seconds (default: 24 hours)
+            ttl: Time-to-live for job records in seconds (default: 24 hours). Also the maximum age of
+                entries in the completed-jobs index.
+            max_completed: Maximum number of entries kept in the completed-jobs index
+            bucketed: Index completed jobs in hourly sorted sets that expire whole, instead of one
+                sorted set trimmed on every write
         """
         self.redis_client = redis.from_url(redis_url, decode_responses=True)
         self.namespace = namespace
         self.ttl = ttl
+        self.max_completed = max_completed
+        self.bucketed = bucketed
+        self.keys = JobKeys(namespace)
+        # Queues this process has already added to the registry, so enqueues skip the SADD
+        self._registered_queues: set[str] = set()
+        # Monotonic start time of each message being processed by this worker, for run-time latency
+        self._started_at: dict[str, float] = {}
+
+    def _register_queues(self, queue_names) -> None:
+        new_queues = {q_name(queue_name) for queue_name in queue_names} - self._registered_queues
+        if not new_queues:
+            return
+        try:
+            self.redis_client.sadd(self.keys.queue_registry(), *new_queues)
+            self._registered_queues |= new_queues
+        except Exception as e:
+            logger.error(f"Failed to register queues {new_queues}: {e}")
+
+    def after_worker_boot(self, broker, worker) -> None:
+        """Register every queue the broker declared and migrate legacy job records once the worker is up"""
+        self._register_queues(broker.get_declared_queues())
+        try:
+            self.migrate_legacy_records()
+        except Exception as e:
+            logger.error(f"Failed to migrate legacy job records: {e}")
+
+    def migrate_legacy_records(self) -> int:
+        """
+        Convert job records stored as JSON strings into hashes, keeping their remaining TTL.
+
+        Runs once per namespace; the version key is set when done, so later worker boots skip the scan.
+        Returns the number of records converted.
+        """
+        version_key = self.keys.job_records_version()
+        if self.redis_client.get(version_key) == JOB_RECORDS_VERSION:
+            return 0
+
+        converted = 0
+        for job_key in self.redis_client.scan_iter(match=self.keys.job_pattern(), count=1000, _type="string"):
+            raw = self.redis_client.get(job_key)
+            ttl_ms = self.redis_client.pttl(job_key)
+            if raw is None:
+                continue
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                record = None
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(job_key)
+            if isinstance(record, dict):
+                pipe.hset(job_key, mapping=legacy_record_fields(record))
+                pipe.pexpire(job_key, ttl_ms if ttl_ms > 0 else self.ttl * 1000)
+                converted += 1
+            pipe.execute()
+
+        self.redis_client.set(version_key, JOB_RECORDS_VERSION)
+        if converted:
+            logger.info(f"Migrated {converted} legacy job records to hashes")
+        return converted
 
-    def _get_job_key(self, message_id: str) -> str:
-        return f"{self.namespace}:job:{message_id}"
+    @staticmethod
+    def _retries_middleware(broker) -> Optional[Retries]:
+        return next((middleware for middleware in broker.middleware if isinstance(middleware, Retries)), None)
 
-    def _get_completed_set_key(self) -> str:
-        return f"{self.namespace}:jobs:completed"
+    @staticmethod
+    def _actor_options(broker, message: Message) -> dict:
+        try:
+            return broker.get_actor(message.actor_name).options
+        except ActorNotFound:
+            return {}
+
+    def _max_retries(self, broker, message: Message) -> Optional[int]:
+        """Retry budget of a message, resolved the way the Retries middleware resolves it"""
+        retries_middleware = self._retries_middleware(broker)
+        default = retries_middleware.max_retries if retries_middleware else 0
+        return message.options.get("max_retries", self._actor_options(broker, message).get("max_retries", default))
+
+    def _retries_exhausted(self, broker, message: Message, exception: BaseException) -> bool:
+        """
+        Whether a failed attempt is final.
+
+        After-hooks run in reverse middleware order, so Retries decides after this middleware and
+        ``message.failed`` is not set yet. Mirror its decision: ``throws`` exceptions fail at once,
+        ``retry_when`` decides when set, otherwise the attempt is final once retries reach max_retries.
+        """
+        if getattr(message, "failed", False):
+            return True
+        retries_middleware = self._retries_middleware(broker)
+        if retries_middleware is None:
+            return True
+
+        actor_options = self._actor_options(broker, message)
+        throws = message.options.get("throws") or actor_options.get("throws")
+        if throws and isinstance(exception, throws):
+            return True
+
+        # Retries compares the count from before it increments it for this attempt
+        retries = message.options.get("retries", 0)
+        retry_when = actor_options.get("retry_when", retries_middleware.retry_when)
+        if retry_when is not None:
+            return not retry_when(retries, exception)
+        max_retries = self._max_retries(broker, message)
+        return max_retries is not None and retries >= max_retries
+
+    def _count_status(self, pipe, message: Message, status: str, at: datetime) -> None:
+        """Queue the counter updates for a status change onto a pipeline"""
+        queue_name = q_name(message.queue_name)
+        pipe.hincrby(self.keys.queue_stats(queue_name), status, 1)
+        pipe.hincrby(self.keys.actor_stats(message.actor_name), status, 1)
+        for granularity, retention in ROLLUP_RETENTION.items():
+            rollup_key = self.keys.rollup(granularity, JobKeys.bucket(granularity, at))
+            pipe.hincrby(rollup_key, status, 1)
+            pipe.hincrby(rollup_key, f"{queue_name}:{status}", 1)
+            pipe.expire(rollup_key, retention)
+
+    def _count_running(self, pipe, message: Message, delta: int) -> None:
+        """Queue the running-jobs gauge update onto a pipeline"""
+        pipe.hincrby(self.keys.queue_stats(q_name(message.queue_name)), "running", delta)
+        pipe.hincrby(self.keys.actor_stats(message.actor_name), "running", delta)
+
+    def _observe_latency(self, pipe, message: Message, kind: LatencyKind, duration_ms: float, at: datetime) -> None:
+        """Queue a latency histogram increment onto a pipeline"""
+        latency_key = self.keys.latency(kind, JobKeys.bucket("minute", at))
+        field = JobKeys.latency_field(q_name(message.queue_name), message.actor_name, latency_bucket(duration_ms))
+        pipe.hincrby(latency_key, field, 1)
+        pipe.expire(latency_key, LATENCY_RETENTION)
+
+    def _index_completed(self, pipe, message_id: str, now: datetime) -> None:
+        """Queue the completed-index write plus its age and count trimming onto a pipeline"""
+        score = now.timestamp()
+        if self.bucketed:
+            completed_key = self.keys.completed_bucket(JobKeys.bucket("hour", now))
+            pipe.zadd(completed_key, {message_id: score})
+            pipe.zremrangebyrank(completed_key, 0, -(self.max_completed + 1))
+            # The whole bucket expires once its newest possible entry is older than the retention
+            pipe.expire(completed_key, self.ttl + BUCKET_SECONDS["hour"])
+        else:
+            completed_key = self.keys.completed_set()
+            pipe.zadd(completed_key, {message_id: score})
+            pipe.zremrangebyscore(completed_key, "-inf", score - self.ttl)
+            pipe.zremrangebyrank(completed_key, 0, -(self.max_completed + 1))
+
+    @staticmethod
+    def _message_fields(message: Message) -> dict:
+        """Job hash fields shared by every lifecycle event; args and kwargs are JSON encoded"""
+        return {
+            "message_id": message.message_id,
+            "actor_name": message.actor_name,
+            "queue_name": q_name(message.queue_name),
+            "args": json.dumps(message.args),
+            "kwargs": json.dumps(message.kwargs),
+            "created_at": datetime.fromtimestamp(message.message_timestamp / 1000, UTC).isoformat(),
+            "retries": message.options.get("retries", 0),
+        }
+
+    def _record_event(
+        self,
+        message: Message,
+        status: str,
+        fields: dict,
+        now: datetime,
+        *,
+        count: Optional[str] = None,
+        running_delta: int = 0,
+        finished: bool = False,
+        latency: Optional[tuple[LatencyKind, float]] = None,
+    ) -> None:
+        """
+        Write one lifecycle event in a single transaction.
+
+        Args:
+            message: The message the event belongs to
+            status: New job status
+            fields: Extra hash fields to set alongside the status
+            now: Event time
+            count: Counter to bump in the queue, actor and rollup stats
+            running_delta: Change to the running-jobs gauge
+            finished: Add the job to the completed-jobs index
+            latency: Histogram kind and duration in milliseconds to record
+        """
+        job_key = self.keys.job(message.message_id)
+        pipe = self.redis_client.pipeline(transaction=True)
+        pipe.hset(job_key, mapping={**fields, "status": status, "updated_at": now.isoformat()})
+        pipe.expire(job_key, self.ttl)
+        if running_delta:
+            self._count_running(pipe, message, running_delta)
+        if count:
+            self._count_status(pipe, message, count, now)
+        if finished:
+            self._index_completed(pipe, message.message_id, now)
+        if latency:
+            self._observe_latency(pipe, message, *latency, now)
+        pipe.publish(self.keys.events_channel(), json.dumps(self._event(message, status, fields, now)))
+        pipe.execute()
+
+    @staticmethod
+    def _event(message: Message, status: str, fields: dict, now: datetime) -> dict:
+        """Lifecycle event published to live subscribers; args and results are left out to keep it small"""
+        event = {
+            "message_id": message.message_id,
+            "actor_name": message.actor_name,
+            "queue_name": q_name(message.queue_name),
+            "status": status,
+            "retries": fields.get("retries", 0),
+            "at": now.isoformat(),
+        }
+        if "error" in fields:
+            event["error"] = fields["error"]
+        return event
+
+    def report_progress(self, message_id: str, processed: int, total: Optional[int] = None) -> None:
+        """Record progress for a long-running job, readable from the dashboard while it runs"""
+        try:
+            progress = {
+                "processed": processed,
+                "updated_at": datetime.now(UTC).isoformat(),
+            }
+            if total is not None:
+                progress["total"] = total
+            progress_key = self.keys.progress(message_id)
+            pipe = self.redis_client.pipeline()
+            pipe.hset(progress_key, mapping=progress)
+            pipe.expire(progress_key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to track progress for job {message_id}: {e}")
+
+    def increment_progress(self, message_id: str, processed: int = 0, failed: int = 0) -> None:
+        """Add to a job's progress counters; used when several child jobs report into one parent"""
+        try:
+            progress_key = self.keys.progress(message_id)
+            pipe = self.redis_client.pipeline()
+            pipe.hincrby(progress_key, "processed", processed)
+            if failed:
+                pipe.hincrby(progress_key, "failed", failed)
+            pipe.hset(progress_key, "updated_at", datetime.now(UTC).isoformat())
+            pipe.expire(progress_key, self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Failed to track progress for job {message_id}: {e}")
+
+    def before_enqueue(self, broker, message: Message, delay) -> None:
+        """
+        Stamp when a message becomes ready on its normal queue, for queue-wait latency, and mark delayed
+        messages so their move to the normal queue once due is not tracked as a new job.
+
+        The worker drops ``eta`` before it moves a due message off the delay queue, so the ready time has
+        to be stamped on that enqueue; options set here are encoded with the message.
+        """
+        if delay is not None:
+            message.options["delay_queued"] = True
+        else:
+            message.options["ready_at_ms"] = current_millis()
+
+    def after_enqueue(self, broker, message: Message, delay) -> None:
+        """Track the job as pending, or as retrying when Retries re-enqueues it, and register its queue"""
+        self._register_queues([message.queue_name])
+        try:
+            now = datetime.now(UTC)
+            fields = self._message_fields(message)
+            # RedisBroker stores the message under its own id for each enqueue; needed to remove it from the queue
+            if "redis_message_id" in message.options:
+                fields["redis_message_id"] = message.options["redis_message_id"]
+
+            if delay is None and message.options.pop("delay_queued", False):
+                # The worker moved a due message from the delay queue; it was counted when it was delayed
+                self._record_event(message, "retrying" if message.options.get("retries") else "pending", fields, now)
+                return
+
+            fields["enqueued_at"] = now.isoformat()
+            max_retries = self._max_retries(broker, message)
+            if max_retries is not None:
+                fields["max_retries"] = max_retries
+            if delay:
+                fields["eta"] = datetime.fromtimestamp(now.timestamp() + delay / 1000, UTC).isoformat()
+
+            deferred_by = message.options.get("deferred_by")
+            if deferred_by:
+                # Handed back by a rate or concurrency limit; already counted when first enqueued
+                fields["deferred_by"] = deferred_by
+                fields["deferrals"] = message.options.get("deferrals", 1)
+                self._record_event(message, "retrying" if message.options.get("retries") else "pending", fields, now)
+            elif message.options.get("retries"):
+                self._record_event(message, "retrying", fields, now)
+            else:
+                self._record_event(message, "pending", fields, now, count="enqueued")
+
+        except Exception as e:
+            logger.error(f"Failed to track enqueue of job {message.message_id}: {e}")
+
+    def before_process_message(self, broker, message: Message) -> None:
+        """Track the job as running and record how long it waited in the queue"""
+        self._started_at[message.message_id] = time.monotonic()
+        # The deferral marker only describes the enqueue that brought the message here; drop it so a
+        # later retry of this delivery is not mistaken for another deferral
+        message.options.pop("deferred_by", None)
+        message.options.pop("delay_queued", None)
+        try:
+            now = datetime.now(UTC)
+            fields = {
+                **self._message_fields(message),
+                "started_at": now.isoformat(),
+            }
+            # Delayed messages, retries and deferrals only become ready once moved to their normal queue
+            ready_at_ms = message.options.get("ready_at_ms", message.message_timestamp)
+            wait_ms = max(now.timestamp() * 1000 - ready_at_ms, 0)
+            self._record_event(message, "running", fields, now, running_delta=1, latency=("wait", wait_ms))
+
+        except Exception as e:
+            logger.error(f"Failed to track start of job {message.message_id}: {e}")
 
     def after_process_message(
         self, broker, message: Message, *, result: Any = None, exception: Optional[BaseException] = None
     ) -> None:
-        """Track job completion"""
+        """Track job completion, failure, or a failed attempt that Retries will run again"""
+        started_at = self._started_at.pop(message.message_id, None)
         try:
-            job_data = {
-                "message_id": message.message_id,
-                "actor_name": message.actor_name,
-                "queue_name": message.queue_name,
-                "args": message.args,
-                "kwargs": message.kwargs,
-                "completed_at": datetime.now(UTC).isoformat(),
-            }
+            now = datetime.now(UTC)
+            fields = self._message_fields(message)
 
             if exception:
-                job_data["status"] = "failed"
-                job_data["failed_at"] = job_data["completed_at"]
-                job_data["error"] = str(exception)
+                fields["error"] = str(exception)
+                if self._retries_exhausted(broker, message, exception):
+                    status = "failed"
+                    fields["failed_at"] = now.isoformat()
+                else:
+                    status = "retrying"
+                    fields["last_failed_at"] = now.isoformat()
 
                 # Send Datadog metric for failed job
                 if DATADOG_AVAILABLE:
@@ -65,14 +403,14 @@ class JobTrackerMiddleware(Middleware):
                         ]
                     )
             else:
-                job_data["status"] = "completed"
+                status = "completed"
+                fields["completed_at"] = now.isoformat()
                 # Store result if it's JSON serializable
                 if result is not None:
                     try:
-                        json.dumps(result)
-                        job_data["result"] = result
+                        fields["result"] = json.dumps(result)
                     except (TypeError, ValueError):
-                        job_data["result"] = str(result)
+                        fields["result"] = json.dumps(str(result))
 
                 # Send Datadog metric for completed job
                 if DATADOG_AVAILABLE:
@@ -85,16 +423,45 @@ class JobTrackerMiddleware(Middleware):
                         ]
                     )
 
-            # Store job data
-            job_key = self._get_job_key(message.message_id)
-            self.redis_client.setex(job_key, self.ttl, json.dumps(job_data))
+            # Only messages this middleware saw start count as running; one that failed in an earlier
+            # middleware's before_process_message never incremented the gauge
+            started = started_at is not None
+            run_latency = ("run", (time.monotonic() - started_at) * 1000) if started else None
+            self._record_event(
+                message, status, fields, now,
+                count=status, running_delta=-1 if started else 0, finished=status != "retrying", latency=run_latency,
+            )
 
-            # Add to completed set (sorted by timestamp)
-            completed_key = self._get_completed_set_key()
-            score = datetime.now(UTC).timestamp()
-            self.redis_client.zadd(completed_key, {message.message_id: score})
-
-            logger.debug(f"Tracked job completion: {message.message_id} ({job_data['status']})")
+            logger.debug(f"Tracked job completion: {message.message_id} ({status})")
 
         except Exception as e:
             logger.error(f"Failed to track job {message.message_id}: {e}")
+
+    def after_skip_message(self, broker, message: Message) -> None:
+        """Track jobs skipped before running, either cancelled or dropped by another middleware"""
+        if message.options.get("deferred"):
+            # Re-enqueued by a limit; the new delivery was already tracked as pending
+            return
+        try:
+            now = datetime.now(UTC)
+            status = "cancelled" if message.options.get("cancelled") else "skipped"
+            fields = {
+                **self._message_fields(message),
+                f"{status}_at": now.isoformat(),
+            }
+            self._record_event(message, status, fields, now, count=status, finished=True)
+            logger.debug(f"Tracked skipped job: {message.message_id} ({status})")
+
+        except Exception as e:
+            logger.error(f"Failed to track skipped job {message.message_id}: {e}")
+
+
+def legacy_record_fields(record: dict) -> dict:
+    """Hash fields for a job record stored as a JSON string before records became hashes"""
+    fields = {}
+    for field, value in record.items():
+        if field in ("args", "kwargs", "result"):
+            fields[field] = json.dumps(value)
+        elif value is not None:
+            fields[field] = value if isinstance(value, (str, int, float)) and not isinstance(value, bool) else json.dumps(value)
+    return fields
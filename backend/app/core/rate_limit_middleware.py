@@ -0,0 +1,173 @@
+"""
+Custom Dramatiq middleware that enforces per-actor rate limits shared by every worker.
+"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Optional, Union
+
+import redis
+from dramatiq import Message, Middleware
+from loguru import logger
+
+from app.core.deferral import defer_message
+from app.core.job_keys import JobKeys
+
+try:
+    from datadog import statsd
+    DATADOG_AVAILABLE = True
+except ImportError:
+    DATADOG_AVAILABLE = False
+
+RATE_PERIODS: dict[str, int] = {
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+}
+
+# Refills the bucket for the time since its last update, then takes one token if there is one.
+# Returns 0 when a token was taken, otherwise the milliseconds until the next token. The time comes
+# from the Redis server so every worker shares one clock (scripts replicate as effects from Redis 5).
+TOKEN_BUCKET_SCRIPT = """
+local per_ms = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * per_ms)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) / per_ms)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / per_ms) + 1000)
+return wait
+"""
+
+
+def parse_rate(rate: Union[str, float]) -> float:
+    """Tokens per second from a number or a string such as "50/s", "600/m" or "1000/h" """
+    if isinstance(rate, (int, float)):
+        per_second = float(rate)
+    else:
+        count, _, period = rate.partition("/")
+        period = period.strip() or "s"
+        if period not in RATE_PERIODS:
+            raise ValueError(f"Invalid rate limit {rate!r}, expected a period of s, m or h")
+        per_second = float(count) / RATE_PERIODS[period]
+    if per_second <= 0:
+        raise ValueError(f"Rate limit {rate!r} must be positive")
+    return per_second
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    key: str
+    per_second: float
+    burst: int
+
+    @classmethod
+    def from_rate(cls, key: str, rate: Union[str, float], burst: Optional[int] = None) -> "RateLimit":
+        """Build a limit from a rate such as "50/s"; the burst defaults to one second's worth of tokens"""
+        per_second = parse_rate(rate)
+        return cls(key=key, per_second=per_second, burst=burst or max(1, math.ceil(per_second)))
+
+
+class RateLimitMiddleware(Middleware):
+    """
+    Limits how often actors run across all workers with a Redis token bucket.
+
+    Actors opt in with options, e.g. ``@dramatiq.actor(rate_limit="50/s", rate_limit_key="smtp")``.
+    Actors sharing a rate_limit_key share one bucket, so the limit holds for a provider used by several
+    actors. ``rate_limit_burst`` caps how many tokens can accumulate (default: one second's worth).
+
+    A message that finds the bucket empty waits in place when the next token is at most
+    max_inline_wait_ms away; otherwise it is deferred back to the broker until its token is due,
+    rather than failed. Time spent throttled is reported as ``dramatiq.rate_limit.wait``.
+    """
+
+    def __init__(self, redis_url: str, namespace: str, max_inline_wait_ms: int = 50):
+        """
+        Args:
+            redis_url: Redis connection URL
+            namespace: Redis key namespace
+            max_inline_wait_ms: Longest wait served by sleeping in the worker thread instead of deferring
+        """
+        self.redis_client = redis.from_url(redis_url, decode_responses=True)
+        self.keys = JobKeys(namespace)
+        self.max_inline_wait_ms = max_inline_wait_ms
+        self._script = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+        self._limits: dict[str, RateLimit] = {}
+
+    @property
+    def actor_options(self):
+        return {"rate_limit", "rate_limit_key", "rate_limit_burst"}
+
+    def after_declare_actor(self, broker, actor) -> None:
+        """Parse the actor's rate limit once, so invalid limits fail at import time"""
+        rate = actor.options.get("rate_limit")
+        if rate is None:
+            return
+        self._limits[actor.actor_name] = RateLimit.from_rate(
+            actor.options.get("rate_limit_key", actor.actor_name), rate, actor.options.get("rate_limit_burst"),
+        )
+
+    def acquire(self, limit: RateLimit) -> int:
+        """Take a token from the limit's bucket; returns 0 on success or the milliseconds until the next token"""
+        return int(self._script(
+            keys=[self.keys.rate_limit(limit.key)],
+            args=[limit.per_second / 1000, limit.burst],
+        ))
+
+    def limit_for(self, actor_name: str) -> Optional[RateLimit]:
+        return self._limits.get(actor_name)
+
+    async def throttle(self, limit: RateLimit) -> None:
+        """Wait for a token inside an async actor, for actors that make several limited calls per message"""
+        while True:
+            try:
+                # The Redis client is synchronous; keep the script call off the event loop
+                wait_ms = await asyncio.to_thread(self.acquire, limit)
+            except Exception as e:
+                logger.error(f"Failed to check rate limit {limit.key}: {e}")
+                return
+            if wait_ms == 0:
+                return
+            await asyncio.sleep(wait_ms / 1000)
+
+    def _report_wait(self, message: Message, limit: RateLimit, waited_ms: float, outcome: str) -> None:
+        if DATADOG_AVAILABLE:
+            tags = [f'actor:{message.actor_name}', f'rate_limit:{limit.key}', f'outcome:{outcome}']
+            statsd.timing('dramatiq.rate_limit.wait', waited_ms, tags=tags)
+
+    def before_process_message(self, broker, message: Message) -> None:
+        limit = self._limits.get(message.actor_name)
+        if limit is None:
+            return
+
+        started = time.monotonic()
+        throttled = False
+        while True:
+            try:
+                wait_ms = self.acquire(limit)
+            except Exception as e:
+                # Never block processing on a failed lookup; worst case the provider throttles us
+                logger.error(f"Failed to check rate limit {limit.key} for job {message.message_id}: {e}")
+                return
+
+            waited_ms = (time.monotonic() - started) * 1000
+            if wait_ms == 0:
+                if throttled:
+                    self._report_wait(message, limit, waited_ms, "waited")
+                return
+            if wait_ms > self.max_inline_wait_ms:
+                self._report_wait(message, limit, waited_ms + wait_ms, "deferred")
+                logger.debug(f"Rate limit {limit.key} deferring job {message.message_id} by {wait_ms}ms")
+                defer_message(broker, message, wait_ms, f"rate_limit:{limit.key}")
+            throttled = True
+            time.sleep(wait_ms / 1000)
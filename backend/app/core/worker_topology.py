@@ -0,0 +1,86 @@
+"""
+Dramatiq queue names, priorities and the worker pools that consume them.
+
+Actors are assigned to named queues so interactive work never waits behind batch work, and each pool
+of worker processes/threads consumes only its own queues. The topology is read from the
+DRAMATIQ_WORKER_TOPOLOGY setting (a JSON list of pools) and falls back to DEFAULT_TOPOLOGY.
+"""
+import json
+import sys
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel, Field, TypeAdapter
+
+from app.core.config import settings
+
+
+class Queues:
+    interactive_email = "interactive_email"
+    bulk_email = "bulk_email"
+    maintenance = "maintenance"
+    analytics = "analytics"
+    default = "default"
+
+
+class Priority:
+    """
+    Actor priorities; lower runs first.
+
+    Priorities order the messages a worker process has already prefetched, so they matter when one
+    pool consumes several queues. Isolation between queues comes from the pools.
+    """
+    interactive = 0
+    bulk = 50
+    background = 100
+
+
+class WorkerPool(BaseModel):
+    name: str = Field(description="Pool name, used to start it on its own")
+    queues: List[str] = Field(description="Queues the pool consumes")
+    processes: int = Field(default=1, ge=1, description="Worker processes in the pool")
+    threads: int = Field(default=4, ge=1, description="Worker threads per process")
+
+
+DEFAULT_TOPOLOGY: List[WorkerPool] = [
+    # Emails users are waiting on get dedicated threads no batch job can occupy
+    WorkerPool(name="interactive", queues=[Queues.interactive_email], processes=1, threads=8),
+    WorkerPool(name="bulk", queues=[Queues.bulk_email], processes=1, threads=4),
+    WorkerPool(
+        name="background",
+        queues=[Queues.maintenance, Queues.analytics, Queues.default],
+        processes=1,
+        threads=2,
+    ),
+]
+
+
+def get_topology() -> List[WorkerPool]:
+    if not settings.dramatiq_worker_topology:
+        return DEFAULT_TOPOLOGY
+    return TypeAdapter(List[WorkerPool]).validate_python(json.loads(settings.dramatiq_worker_topology))
+
+
+def get_pool(name: str, topology: Optional[List[WorkerPool]] = None) -> WorkerPool:
+    for pool in topology or get_topology():
+        if pool.name == name:
+            return pool
+    raise ValueError(f"Unknown worker pool {name!r}")
+
+
+def uncovered_queues(declared_queues: Iterable[str], topology: Optional[List[WorkerPool]] = None) -> set[str]:
+    """Declared queues no pool consumes; messages sent to them would never run"""
+    consumed = {queue for pool in topology or get_topology() for queue in pool.queues}
+    return set(declared_queues) - consumed
+
+
+def worker_command(pool: WorkerPool, watch: Optional[str] = None) -> List[str]:
+    """dramatiq CLI invocation for one pool"""
+    command = [
+        sys.executable, "-m", "dramatiq", "app.tasks.background_tasks",
+        "--processes", str(pool.processes),
+        "--threads", str(pool.threads),
+        "--queues", *pool.queues,
+    ]
+    if watch:
+        command += ["--watch", watch]
+    return command
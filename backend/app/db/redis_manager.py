@@ -0,0 +1,75 @@
+from typing import Optional, Dict, Any
+
+from loguru import logger
+from redis.asyncio import Redis, BlockingConnectionPool
+
+from app.core.config import settings
+
+
+class RedisManager:
+    """Owns the shared, bounded async Redis connection pool used by the API"""
+
+    def __init__(self):
+        self._pool: Optional[BlockingConnectionPool] = None
+        self._client: Optional[Redis] = None
+
+    async def connect(self) -> None:
+        if self._client:
+            return
+        self._pool = BlockingConnectionPool.from_url(
+            settings.dramatiq_broker_url,
+            max_connections=settings.redis_max_connections,
+            timeout=settings.redis_pool_timeout,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+            decode_responses=True,
+        )
+        self._client = Redis(connection_pool=self._pool)
+        # Connections are opened lazily, so an unreachable Redis at startup only degrades monitoring
+        if await self.health_check():
+            logger.info("Redis connection pool established successfully")
+
+    async def disconnect(self) -> None:
+        if self._client:
+            await self._client.aclose()
+            await self._pool.disconnect()
+            self._client = None
+            self._pool = None
+            logger.info("Redis connection pool closed")
+
+    async def health_check(self) -> bool:
+        try:
+            if not self._client:
+                return False
+            await self._client.ping()
+            return True
+        except Exception as e:
+            logger.warning(f"Redis health check failed: {e}")
+            return False
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Connection pool usage, for spotting saturation before requests start waiting on it"""
+        if not self._pool:
+            return {"initialized": False}
+        in_use = len(getattr(self._pool, "_in_use_connections", ()))
+        available = len(getattr(self._pool, "_available_connections", ()))
+        return {
+            "initialized": True,
+            "max_connections": self._pool.max_connections,
+            "in_use_connections": in_use,
+            "idle_connections": available,
+            "created_connections": in_use + available,
+            "pool_timeout_seconds": settings.redis_pool_timeout,
+        }
+
+    @property
+    def client(self) -> Optional[Redis]:
+        return self._client
+
+    @property
+    def is_connected(self) -> bool:
+        return self._client is not None
+
+
+# Global Redis manager instance
+redis_manager = RedisManager()
@@ -12,6 +12,10 @@ from pydantic import ValidationError
 from app.core.config import settings
 from app.core.logging_config import setup_logging, get_logger
 from app.db.db_manager import db_manager, create_app_admins
+from app.db.redis_manager import redis_manager
+from app.services.dramatiq.event_hub import job_event_hub
+from app.services.email.async_smtp import async_smtp_transport
+from app.services.outbox.relay import outbox_relay
 from app.api.v1.auth.endpoints import auth_router
 from app.api.v1.user.endpoints import user_router
 from app.api.v1.role.endpoints import role_router
@@ -32,9 +36,15 @@ logger = get_logger()
 async def lifespan(app: FastAPI):
     logger.debug(f"🚀 Starting app -> {settings.mode} mode")
     await db_manager.connect()
+    await redis_manager.connect()
     await create_app_admins()
+    outbox_relay.start()
     yield
     logger.debug(f"🛑 Stopping app...")
+    await outbox_relay.stop()
+    await job_event_hub.stop()
+    await async_smtp_transport.close()
+    await redis_manager.disconnect()
     await db_manager.disconnect()
 
 
@@ -104,7 +114,6 @@ async def health_check():
     Comprehensive health check endpoint.
     Returns 200 if all services are healthy, 503 otherwise.
     """
-    import redis
     import dramatiq
 
     health_status = {
@@ -122,21 +131,13 @@ async def health_check():
     if not db_healthy:
         all_healthy = False
 
-    # Check Redis
-    try:
-        redis_client = redis.from_url(settings.redis_url, decode_responses=True)
-        redis_client.ping()
-        health_status["services"]["redis"] = {
-            "status": "healthy",
-            "type": "redis"
-        }
-    except Exception as e:
-        logger.warning(f"Redis health check failed: {e}")
-        health_status["services"]["redis"] = {
-            "status": "unhealthy",
-            "type": "redis",
-            "error": str(e)
-        }
+    # Check Redis through the shared pool so a slow Redis cannot block the event loop
+    redis_healthy = await redis_manager.health_check()
+    health_status["services"]["redis"] = {
+        "status": "healthy" if redis_healthy else "unhealthy",
+        "type": "redis"
+    }
+    if not redis_healthy:
         all_healthy = False
 
     # Check Dramatiq broker
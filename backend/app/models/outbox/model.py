@@ -0,0 +1,146 @@
+from datetime import datetime, UTC, timedelta
+from enum import Enum
+from typing import Any, List, Optional, Self, Tuple
+
+from beanie import Document, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import settings
+
+
+class OutboxStatus(str, Enum):
+    pending = "pending"
+    relaying = "relaying"
+    sent = "sent"
+    deduplicated = "deduplicated"
+    failed = "failed"
+
+
+class OutboxBase(BaseModel):
+    actor_name: str = Field(description="Dramatiq actor the message is sent to")
+    args: List[Any] = Field(default_factory=list, description="Positional actor arguments")
+    kwargs: dict = Field(default_factory=dict, description="Keyword actor arguments")
+    dedupe_key: Optional[str] = Field(
+        default=None, description="Pending messages sharing this key are sent once, with the newest payload"
+    )
+    status: OutboxStatus = Field(default=OutboxStatus.pending, description="Relay state of the message")
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC), description="When the message was written")
+    claimed_by: Optional[str] = Field(default=None, description="Relay currently enqueueing the message")
+    claimed_at: Optional[datetime] = Field(default=None, description="When the relay claimed the message")
+    sent_at: Optional[datetime] = Field(default=None, description="When the message reached the broker")
+    message_id: Optional[str] = Field(default=None, description="Dramatiq message ID once enqueued")
+    attempts: int = Field(default=0, description="Failed attempts to enqueue the message")
+    last_error: Optional[str] = Field(default=None, description="Why the last attempt to enqueue failed")
+
+
+class OutboxMessage(Document, OutboxBase):
+    class Settings:
+        name = "Outbox"
+        indexes = [
+            IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),  # Relay scans pending messages in order
+            # At most one pending message per dedupe key, so concurrent upserts cannot both insert
+            IndexModel(
+                [("dedupe_key", ASCENDING), ("status", ASCENDING)],
+                name="dedupe_key_pending_unique",
+                unique=True,
+                partialFilterExpression={"status": OutboxStatus.pending.value, "dedupe_key": {"$type": "string"}},
+            ),
+            # Relayed messages are removed once the retention has passed
+            IndexModel("sent_at", expireAfterSeconds=settings.outbox_retention_seconds),
+        ]
+
+    @classmethod
+    async def add(cls, actor_name: str, *args, dedupe_key: Optional[str] = None, **kwargs) -> None:
+        """
+        Write a message for the relay to enqueue.
+
+        With a dedupe_key, a message with the same key that is still pending takes this payload instead of
+        a second message being written, so only the newest request is sent (e.g. the latest reset token).
+        """
+        message = cls(actor_name=actor_name, args=list(args), kwargs=kwargs, dedupe_key=dedupe_key)
+        if dedupe_key is None:
+            await message.insert()
+            return
+        document = message.model_dump(exclude={"id"})
+        payload = {field: document.pop(field) for field in ("actor_name", "args", "kwargs")}
+        document.pop("dedupe_key")
+        document["status"] = OutboxStatus.pending.value
+        # A concurrent upsert may insert first; the unique index rejects the second, which then updates
+        for attempt in range(2):
+            try:
+                await cls.get_motor_collection().update_one(
+                    {"dedupe_key": dedupe_key, "status": OutboxStatus.pending.value},
+                    {"$set": payload, "$setOnInsert": document},
+                    upsert=True,
+                )
+                return
+            except DuplicateKeyError:
+                if attempt:
+                    raise
+
+    @classmethod
+    async def claim_batch(cls, claim_id: str, limit: int, claim_timeout: int) -> List[Self]:
+        """
+        Claim up to limit pending messages, oldest first, under a claim id unique to this batch.
+
+        Messages claimed by a relay that stopped before finishing are claimable again after claim_timeout.
+        """
+        now = datetime.now(UTC)
+        claimable = {"$or": [
+            {"status": OutboxStatus.pending.value},
+            {"status": OutboxStatus.relaying.value, "claimed_at": {"$lt": now - timedelta(seconds=claim_timeout)}},
+        ]}
+        collection = cls.get_motor_collection()
+        ids = [doc["_id"] async for doc in collection.find(claimable, {"_id": 1}).sort("_id", 1).limit(limit)]
+        if not ids:
+            return []
+        # Re-check the claim condition so two relays racing for the same ids each get a disjoint set
+        await collection.update_many(
+            {"$and": [{"_id": {"$in": ids}}, claimable]},
+            {"$set": {"status": OutboxStatus.relaying.value, "claimed_by": claim_id, "claimed_at": now}},
+        )
+        return await cls.find({"_id": {"$in": ids}, "claimed_by": claim_id}).sort("_id").to_list()
+
+    @classmethod
+    async def mark(cls, ids: List[PydanticObjectId], status: OutboxStatus, message_ids: Optional[dict] = None) -> None:
+        """Record the outcome of relayed messages in one bulk write; message_ids maps outbox ids to Dramatiq message ids"""
+        if not ids:
+            return
+        now = datetime.now(UTC)
+        message_ids = message_ids or {}
+        await cls.get_motor_collection().bulk_write(
+            [
+                UpdateOne({"_id": _id}, {
+                    "$set": {"status": status.value, "sent_at": now, "message_id": message_ids.get(_id)},
+                    "$unset": {"claimed_by": ""},
+                })
+                for _id in ids
+            ],
+            ordered=False,
+        )
+
+    @classmethod
+    async def record_failures(cls, failures: List[Tuple[Self, str, bool]], max_attempts: int) -> int:
+        """
+        Record entries the relay could not enqueue in one bulk write; returns how many are now failed.
+
+        failures holds (entry, error, permanent). An entry stays relaying, and is claimed again once its claim
+        times out, until it is permanent or has been tried max_attempts times; then it is failed and kept
+        for inspection instead of being retried.
+        """
+        if not failures:
+            return 0
+        updates = []
+        failed = 0
+        for entry, error, permanent in failures:
+            attempts = entry.attempts + 1
+            status = OutboxStatus.failed if permanent or attempts >= max_attempts else OutboxStatus.relaying
+            failed += status == OutboxStatus.failed
+            updates.append(UpdateOne({"_id": entry.id}, {
+                "$set": {"status": status.value, "attempts": attempts, "last_error": error},
+                "$unset": {"claimed_by": ""},
+            }))
+        await cls.get_motor_collection().bulk_write(updates, ordered=False)
+        return failed
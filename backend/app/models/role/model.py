@@ -1,10 +1,14 @@
 from datetime import datetime
-from typing import List, Self
+from typing import List, Literal, Self
 
 from beanie import PydanticObjectId, Document
+from bson import ObjectId
+from fastapi import HTTPException
 from pydantic import BaseModel, Field
 from pymongo import IndexModel
 
+from app.models.util.model import object_id_key
+
 
 class RoleBase(BaseModel):
     name: str = Field(description="Name of the role")
@@ -57,3 +61,40 @@ class Role(Document, RoleBase):
     async def by_name(cls, _name: str) -> Self:
         """Get a role by name"""
         return await cls.find_one({"name": _name})
+
+    @classmethod
+    async def by_ids(cls, _ids: List[PydanticObjectId | str]) -> List[Self]:
+        """Get roles by ids with a single $in query, in the order requested. Unknown ids are skipped."""
+        object_ids = [PydanticObjectId(_id) for _id in _ids if ObjectId.is_valid(str(_id))]
+        if not object_ids:
+            return []
+        roles = {role.id: role for role in await cls.find({"_id": {"$in": object_ids}}).to_list()}
+        return [roles[_id] for _id in dict.fromkeys(object_ids) if _id in roles]
+
+    @classmethod
+    async def by_names(cls, _names: List[str]) -> List[Self]:
+        """Get roles by names with a single $in query, in the order requested. Unknown names are skipped."""
+        if not _names:
+            return []
+        roles = {role.name: role for role in await cls.find({"name": {"$in": list(_names)}}).to_list()}
+        return [roles[name] for name in dict.fromkeys(_names) if name in roles]
+
+    @classmethod
+    async def resolve(cls, keys: List[PydanticObjectId | str], by: Literal["id", "name"] = "id") -> List[Self]:
+        """
+        Resolve a list of role ids or names in one round trip.
+
+        Raises a 404 listing every role that could not be found, rather than failing on the first one.
+        """
+        if by == "name":
+            roles = await cls.by_names(keys)
+            found = {role.name for role in roles}
+            missing = [str(key) for key in dict.fromkeys(keys) if str(key) not in found]
+        else:
+            roles = await cls.by_ids(keys)
+            found = {str(role.id) for role in roles}
+            # Ids such as uppercase hex are found by the query but differ from str(role.id)
+            missing = [str(key) for key in dict.fromkeys(keys) if object_id_key(str(key)) not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Role(s) not found: {', '.join(missing)}")
+        return roles
@@ -1,11 +1,13 @@
 from datetime import datetime, UTC
-from typing import List, Self, Optional, Tuple
+from typing import AsyncIterator, Awaitable, Callable, List, Self, Optional, Tuple
 from beanie import PydanticObjectId, Document
+from bson import ObjectId
 from fastapi import HTTPException
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from pymongo import IndexModel
 
 from app.models.role.model import RoleBase, Role
+from app.models.util.model import EmailTemplate
 
 
 
@@ -111,6 +113,39 @@ class UserUpdateRequest(BaseModel):
     api_keys: List[APIKey] = Field(default_factory=list, description="List of API keys associated with the user")
 
 
+class UserFilter(BaseModel):
+    """Filter over indexed user fields. Unset fields are ignored; an empty filter matches every user."""
+    source: Optional[str] = Field(default=None, description="Only match users from this source")
+    email_confirmed: Optional[bool] = Field(default=None, description="Only match users with this email confirmation state")
+    is_active: Optional[bool] = Field(default=None, description="Only match active or inactive users")
+
+    def to_query(self) -> dict:
+        return self.model_dump(exclude_none=True)
+
+
+class UserSelection(BaseModel):
+    """Selects users either by an explicit id list or by a filter"""
+    user_ids: Optional[List[PydanticObjectId]] = Field(default=None, max_length=10000, description="Explicit list of user IDs")
+    filter: Optional[UserFilter] = Field(default=None, description="Filter selecting users by indexed fields")
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        if (self.user_ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of user_ids or filter")
+        return self
+
+    def to_query(self) -> dict:
+        if self.user_ids is not None:
+            return {"_id": {"$in": self.user_ids}}
+        return self.filter.to_query()
+
+
+class BulkEmailRequest(BaseModel):
+    """Email every selected user with one of the account email templates"""
+    selection: UserSelection = Field(description="Users to email")
+    template: EmailTemplate = Field(description="Email template to send to each user")
+
+
 class User(Document, UserAuth):
     class Settings:
         name = "User"
@@ -163,6 +198,21 @@ class User(Document, UserAuth):
             _id = str(_id)
         return await cls.get(_id)
 
+    @classmethod
+    async def by_ids(cls, _ids: List[PydanticObjectId | str]) -> List[Self]:
+        """Get users by ids with a single $in query. Invalid or unknown ids are skipped."""
+        object_ids = [PydanticObjectId(_id) for _id in _ids if ObjectId.is_valid(str(_id))]
+        if not object_ids:
+            return []
+        return await cls.find({"_id": {"$in": object_ids}}).to_list()
+
+    @classmethod
+    async def by_emails(cls, _emails: List[str]) -> List[Self]:
+        """Get users by emails with a single $in query. Unknown emails are skipped."""
+        if not _emails:
+            return []
+        return await cls.find({"email": {"$in": list(_emails)}}).to_list()
+
     @classmethod
     async def by_client_id(cls, client_id: str, raise_on_zero=True) -> Self:
         results = await cls.find({"api_keys.client_id": client_id}).to_list()
@@ -181,13 +231,60 @@ class User(Document, UserAuth):
         results = await cls.find({"roles": role_id}).to_list()
         return results
 
+    @classmethod
+    async def update_in_chunks(
+            cls,
+            query: dict,
+            update: dict,
+            chunk_size: int = 1000,
+            on_chunk: Optional[Callable[[int, int], Awaitable[None]]] = None,
+    ) -> Tuple[int, int]:
+        """
+        Apply an update_many to every user matching the query, chunk_size users at a time.
+
+        Chunks are walked in _id order so a large selection never holds one long-running write.
+        on_chunk, if given, is awaited with the running (matched, modified) totals after each chunk.
+        Returns the total (matched, modified) counts.
+        """
+        collection = cls.get_motor_collection()
+        matched = modified = 0
+        async for ids in cls.iter_id_chunks(query, chunk_size):
+            result = await collection.update_many({"_id": {"$in": ids}}, update)
+            matched += result.matched_count
+            modified += result.modified_count
+            if on_chunk:
+                await on_chunk(matched, modified)
+        return matched, modified
+
+    @classmethod
+    async def iter_id_chunks(cls, query: dict, chunk_size: int = 1000) -> AsyncIterator[List[ObjectId]]:
+        """
+        Yield the ids of users matching the query, chunk_size at a time, in _id order.
+
+        Each chunk is a separate keyset-paginated query, so no cursor is held open between chunks.
+        """
+        collection = cls.get_motor_collection()
+        last_id = None
+        while True:
+            chunk_query = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+            cursor = collection.find(chunk_query, {"_id": 1}).sort("_id", 1).limit(chunk_size)
+            ids = [doc["_id"] async for doc in cursor]
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+
     async def user_roles(self) -> List[RoleBase]:
         """Get all user roles, by their ids"""
         roles = await Role.find({"_id": {"$in": self.roles}}).to_list()
         return roles
 
     async def get_user_scopes_and_roles(self) -> Tuple[List[str], List[str]]:
-        user_roles = await self.user_roles()
+        return self.scopes_and_roles_from(await self.user_roles())
+
+    @staticmethod
+    def scopes_and_roles_from(user_roles: List[RoleBase]) -> Tuple[List[str], List[str]]:
+        """Scopes and role names for already loaded roles, so callers can batch the role lookup"""
         user_role_names: List = [role.name for role in user_roles]
         scopes: List = [f"{role.name}:{scope}" for role in user_roles for scope in role.scopes]
         return scopes, user_role_names
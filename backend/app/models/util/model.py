@@ -1,36 +1,20 @@
-import base64
 from enum import Enum
-from typing import Optional
+from typing import Callable, Dict, Generic, List, Optional, TypeVar
 
-from pydantic import BaseModel, model_serializer, computed_field, Field
+from beanie import PydanticObjectId
+from bson import ObjectId
+from pydantic import BaseModel, Field
 
+from app.core.config import settings
 
-class EmailAttachment(BaseModel):
-    file_name: str = Field(description="Name of the attached file")
-    file_data_encoded: Optional[str] = Field(default=None, description="Base64 encoded file data")
-
-    def __init__(self, file_name: str, file_data: Optional[bytes] = None, file_data_encoded: Optional[str] = None):
-        super().__init__(file_name=file_name)
-        self.file_name = file_name
-        self.file_data_encoded = self._b64enc(file_data) if file_data is not None else file_data_encoded
-
-    def _b64enc(self, v) -> str:
-        return base64.b64encode(v).decode("utf-8")
-
-    @computed_field
-    def file_data(self) -> bytes:
-        return base64.b64decode(self.file_data_encoded)
+T = TypeVar("T")
 
-    @file_data.setter
-    def file_data(self, new_file_data: bytes) -> None:
-        self.file_data_encoded = self._b64enc(new_file_data)
 
-    @model_serializer()
-    def serialize_model(self):
-        return {
-            "file_name": self.file_name,
-            "file_data_encoded": self.file_data_encoded
-        }
+class EmailAttachment(BaseModel):
+    """Claim check for an attachment in the attachment store; the file bytes never travel with the email"""
+    file_name: str = Field(description="Name of the attached file")
+    attachment_id: str = Field(description="ID of the file in the attachment store")
+    content_type: Optional[str] = Field(default=None, description="MIME type, guessed from the file name when unset")
 
 
 class EmailData(BaseModel):
@@ -40,6 +24,43 @@ class EmailData(BaseModel):
     attachments: Optional[list[EmailAttachment]] = Field(default=None, description="List of file attachments")
 
 
+class EmailTemplate(str, Enum):
+    welcome = "welcome"
+    reset_password = "reset_password"
+    magic_link = "magic_link"
+
+
+class BulkUpdateResult(BaseModel):
+    matched: int = Field(default=0, description="Number of documents matched by the update")
+    modified: int = Field(default=0, description="Number of documents actually modified")
+
+
+class BatchLookupRequest(BaseModel):
+    keys: List[str] = Field(
+        min_length=1,
+        max_length=settings.batch_lookup_max_keys,
+        description="Keys to look up in a single query",
+    )
+
+
+def object_id_key(key: str) -> str:
+    """Canonical string form of an ObjectId key (e.g. lowercase hex); invalid keys are returned unchanged"""
+    return str(PydanticObjectId(key)) if ObjectId.is_valid(key) else key
+
+
+class BatchLookupResult(BaseModel, Generic[T]):
+    results: Dict[str, Optional[T]] = Field(description="Result for every requested key, null when not found")
+    not_found: List[str] = Field(default_factory=list, description="Requested keys that matched nothing")
+
+    @classmethod
+    def from_found(
+        cls, keys: List[str], found: Dict[str, T], normalize: Optional[Callable[[str], str]] = None
+    ) -> "BatchLookupResult[T]":
+        """Map every requested key to its match in found; normalize maps a key to the form found is keyed by"""
+        results = {key: found.get(normalize(key) if normalize else key) for key in keys}
+        return cls(results=results, not_found=[key for key, value in results.items() if value is None])
+
+
 class MessageType(str, Enum):
     success = "success"
     failure = "failure"
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.services.dramatiq.dramatiq_service import DramatiqService
+
+TOTAL_STAT_FIELDS = ("total_jobs", "pending_jobs", "completed_jobs", "failed_jobs", "running_jobs", "retrying_jobs", "cancelled_jobs")
+
+
+class DashboardSnapshotService:
+    """
+    Builds the dashboard overview and shares it between callers.
+
+    Per-queue stats are gathered concurrently and the combined snapshot is cached for ttl_seconds.
+    Requests arriving while a snapshot is being built await that same computation instead of starting
+    their own, so any number of admins polling the dashboard cost one build per ttl window.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._built_at: float = 0.0
+        self._in_flight: Optional[asyncio.Task] = None
+
+    async def get_snapshot(self, dramatiq_service: DramatiqService, force_refresh: bool = False) -> Dict[str, Any]:
+        if force_refresh or not self._is_fresh():
+            if self._in_flight is None or self._in_flight.done():
+                self._in_flight = asyncio.create_task(self._build(dramatiq_service))
+            # Shield the shared build so one client disconnecting does not cancel it for everyone else
+            await asyncio.shield(self._in_flight)
+
+        return {
+            **self._snapshot,
+            "snapshot_age_seconds": round(time.monotonic() - self._built_at, 3),
+        }
+
+    def _is_fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._built_at < self.ttl_seconds
+
+    async def _build(self, dramatiq_service: DramatiqService) -> None:
+        broker_info, queues = await asyncio.gather(
+            dramatiq_service.get_broker_info(),
+            dramatiq_service.get_all_queues(),
+        )
+        queue_stats = await asyncio.gather(*(dramatiq_service.get_queue_stats(queue) for queue in queues))
+
+        total_stats = {field: sum(stats.get(field, 0) for stats in queue_stats) for field in TOTAL_STAT_FIELDS}
+        self._snapshot = {
+            "broker_info": broker_info,
+            "total_stats": total_stats,
+            "queue_stats": list(queue_stats),
+            "queues": queues,
+            "generated_at": datetime.now(UTC).isoformat(),
+        }
+        self._built_at = time.monotonic()
+
+
+# Shared per process so every request sees the same cached snapshot
+dashboard_snapshot_service = DashboardSnapshotService(settings.dramatiq_dashboard_cache_seconds)
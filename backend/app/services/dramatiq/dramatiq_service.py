@@ -1,11 +1,44 @@
-from typing import List, Dict, Any, Optional
-from datetime import datetime, timedelta
-import redis
+from typing import List, Dict, Any, Optional, Iterable
+from datetime import datetime, timedelta, UTC
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
 import json
+import asyncio
+import dramatiq
+from dramatiq import Message
+from dramatiq.common import current_millis, dq_name, q_name, xq_name
 from fastapi import HTTPException
 from loguru import logger
 
 from app.core.config import settings
+import app.core.dramatiq_config  # noqa: F401  (configures the global broker)
+from app.core.job_keys import (
+    JobKeys, Granularity, BUCKET_SECONDS, LATENCY_BOUNDS_MS, LATENCY_RETENTION, ROLLUP_RETENTION,
+)
+
+JOB_STATUSES = ("enqueued", "completed", "failed", "retrying", "running", "cancelled", "skipped")
+TERMINAL_STATUSES = ("completed", "failed", "cancelled", "skipped")
+# Statuses from which a job may still be cancelled before a worker picks it up
+CANCELLABLE_STATUSES = ("pending", "retrying")
+
+LATENCY_PERCENTILES = (50, 95, 99)
+
+# Removes a message from a queue and its delay queue, in RedisBroker's layout: KEYS are the id list
+# and message hash of the queue, then of its delay queue. Lists longer than ARGV[2] are not scanned
+# by LREM. Returns 1 when removed, 0 when not found and -1 when the list is too long to scan.
+REMOVE_FROM_QUEUE_SCRIPT = """
+for i = 1, #KEYS, 2 do
+    if redis.call('HEXISTS', KEYS[i + 1], ARGV[1]) == 1 then
+        if redis.call('LLEN', KEYS[i]) > tonumber(ARGV[2]) then
+            return -1
+        end
+        redis.call('LREM', KEYS[i], 0, ARGV[1])
+        redis.call('HDEL', KEYS[i + 1], ARGV[1])
+        return 1
+    end
+end
+return 0
+"""
 
 
 class DramatiqJob:
@@ -17,17 +50,41 @@ class DramatiqJob:
         self.kwargs = data.get('kwargs', {})
         self.options = data.get('options', {})
         self.created_at = data.get('created_at')
+        self.enqueued_at = data.get('enqueued_at')
+        self.eta = data.get('eta')
         self.started_at = data.get('started_at')
         self.completed_at = data.get('completed_at')
         self.failed_at = data.get('failed_at')
+        self.cancelled_at = data.get('cancelled_at')
+        self.skipped_at = data.get('skipped_at')
+        self.last_failed_at = data.get('last_failed_at')
+        self.updated_at = data.get('updated_at')
         self.retries = data.get('retries', 0)
         self.max_retries = data.get('max_retries', 3)
-        self.status = self._determine_status()
+        self.deferred_by = data.get('deferred_by')
+        self.deferrals = data.get('deferrals', 0)
+        self.status = data.get('status') or self._determine_status()
         self.result = data.get('result')
         self.error = data.get('error')
 
+    @classmethod
+    def from_record(cls, record: Dict[str, str]) -> "DramatiqJob":
+        """Build a job from the lifecycle hash written by the job tracker"""
+        data: Dict[str, Any] = dict(record)
+        for field in ("args", "kwargs", "result"):
+            if field in data:
+                data[field] = json.loads(data[field])
+        for field in ("retries", "max_retries", "deferrals"):
+            if field in data:
+                data[field] = int(data[field])
+        return cls(data)
+
     def _determine_status(self) -> str:
-        if self.failed_at:
+        if self.cancelled_at:
+            return "cancelled"
+        elif self.skipped_at:
+            return "skipped"
+        elif self.failed_at:
             return "failed"
         elif self.completed_at:
             return "completed"
@@ -45,11 +102,19 @@ class DramatiqJob:
             "kwargs": self.kwargs,
             "status": self.status,
             "created_at": self.created_at,
+            "enqueued_at": self.enqueued_at,
+            "eta": self.eta,
             "started_at": self.started_at,
             "completed_at": self.completed_at,
             "failed_at": self.failed_at,
+            "cancelled_at": self.cancelled_at,
+            "skipped_at": self.skipped_at,
+            "last_failed_at": self.last_failed_at,
+            "updated_at": self.updated_at,
             "retries": self.retries,
             "max_retries": self.max_retries,
+            "deferred_by": self.deferred_by,
+            "deferrals": self.deferrals,
             "result": self.result,
             "error": self.error
         }
@@ -58,56 +123,92 @@ class DramatiqJob:
 class DramatiqService:
     """Service for monitoring and managing Dramatiq jobs"""
 
-    def __init__(self):
-        self.redis_client = None
+    def __init__(self, redis_client: Redis):
+        self.redis_client = redis_client
         self.namespace = settings.dramatiq_namespace
+        self.keys = JobKeys(self.namespace)
 
-    def _get_redis_client(self):
-        if not self.redis_client:
-            redis_url = settings.dramatiq_broker_url
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+    def _get_redis_client(self) -> Redis:
         return self.redis_client
 
-    def _get_queue_key(self, queue_name: str = "default") -> str:
-        return f"{self.namespace}:queue:{queue_name}"
-
-    def _get_result_key(self, message_id: str) -> str:
-        return f"{self.namespace}:result:{message_id}"
-
-    def _get_message_key(self, message_id: str) -> str:
-        return f"{self.namespace}:message:{message_id}"
-
-    def _get_job_key(self, message_id: str) -> str:
-        """Get key for tracked job data"""
-        return f"{self.namespace}:job:{message_id}"
-
-    def _get_completed_jobs_set_key(self) -> str:
-        """Get key for completed jobs sorted set"""
-        return f"{self.namespace}:jobs:completed"
+    @staticmethod
+    def _parse_jobs(records: Iterable[Optional[str]]) -> List[DramatiqJob]:
+        """Parse raw job records in one pass, skipping missing (expired) and malformed entries"""
+        jobs = []
+        for job_data in records:
+            if not job_data:
+                continue
+            try:
+                jobs.append(DramatiqJob(json.loads(job_data)))
+            except (json.JSONDecodeError, Exception) as e:
+                logger.warning(f"Failed to parse job data: {e}")
+        return jobs
+
+    @staticmethod
+    def _parse_records(records: Iterable[Dict[str, str]]) -> List[DramatiqJob]:
+        """Parse job tracker hashes, skipping missing (expired) and malformed entries"""
+        jobs = []
+        for record in records:
+            if not record:
+                continue
+            try:
+                jobs.append(DramatiqJob.from_record(record))
+            except (json.JSONDecodeError, ValueError) as e:
+                logger.warning(f"Failed to parse job record: {e}")
+        return jobs
+
+    async def _fetch_completed_jobs(self, message_ids: List[str]) -> List[DramatiqJob]:
+        """Fetch tracked job records for the given ids in one pipelined round trip"""
+        if not message_ids:
+            return []
+        redis_client = self._get_redis_client()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for message_id in message_ids:
+                pipe.hgetall(self.keys.job(message_id))
+            records = await pipe.execute(raise_on_error=False)
+
+        # Records written before the tracker stored hashes are JSON strings until a worker boot migrates them
+        legacy_ids = [message_id for message_id, record in zip(message_ids, records) if isinstance(record, ResponseError)]
+        legacy_records = {}
+        if legacy_ids:
+            legacy_records = dict(zip(legacy_ids, await redis_client.mget([self.keys.job(i) for i in legacy_ids])))
+
+        jobs = []
+        for message_id, record in zip(message_ids, records):
+            if message_id in legacy_records:
+                jobs.extend(self._parse_jobs([legacy_records[message_id]]))
+            elif isinstance(record, dict):
+                jobs.extend(self._parse_records([record]))
+        return jobs
+
+    def _queue_recent_completed_ids(self, pipe, limit: int) -> int:
+        """
+        Queue the reads for the most recent completed job ids onto a pipeline.
+
+        Returns how many results they produce; pass those to _merge_completed_ids.
+        """
+        if not settings.dramatiq_completed_buckets:
+            pipe.zrevrange(self.keys.completed_set(), 0, limit - 1)
+            return 1
+        current = JobKeys.bucket("hour", datetime.now(UTC))
+        bucket_count = settings.dramatiq_job_retention_seconds // BUCKET_SECONDS["hour"] + 1
+        for bucket in range(current, current - bucket_count, -1):
+            pipe.zrevrange(self.keys.completed_bucket(bucket), 0, limit - 1)
+        return bucket_count
+
+    @staticmethod
+    def _merge_completed_ids(results: List[List[str]], limit: int) -> List[str]:
+        """Newest-first ids across the results queued by _queue_recent_completed_ids"""
+        return [message_id for ids in results for message_id in ids][:limit]
 
     async def _get_completed_jobs(self, limit: int = 100) -> List[DramatiqJob]:
         """Get completed jobs from job tracker"""
         try:
             redis_client = self._get_redis_client()
-            completed_key = self._get_completed_jobs_set_key()
-
-            # Get most recent completed job IDs
-            message_ids = redis_client.zrevrange(completed_key, 0, limit - 1)
-            jobs = []
-
-            for message_id in message_ids:
-                job_key = self._get_job_key(message_id)
-                job_data = redis_client.get(job_key)
-
-                if job_data:
-                    try:
-                        job_dict = json.loads(job_data)
-                        jobs.append(DramatiqJob(job_dict))
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Failed to parse job {message_id}: {e}")
-                        continue
-
-            return jobs
+            async with redis_client.pipeline(transaction=False) as pipe:
+                self._queue_recent_completed_ids(pipe, limit)
+                message_ids = self._merge_completed_ids(await pipe.execute(), limit)
+            return await self._fetch_completed_jobs(message_ids)
 
         except Exception as e:
             logger.error(f"Failed to get completed jobs: {e}")
@@ -117,23 +218,20 @@ class DramatiqService:
         """Get all jobs from a specific queue, including pending and completed jobs"""
         try:
             redis_client = self._get_redis_client()
-            queue_key = self._get_queue_key(queue_name)
 
-            # Get pending jobs from queue
-            job_data_list = redis_client.lrange(queue_key, 0, limit - 1)
-            jobs = []
+            # Pending ids and the most recent completed ids in one round trip, then their bodies and records
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.lrange(self.keys.queue(queue_name), 0, limit - 1)
+                self._queue_recent_completed_ids(pipe, limit)
+                pending_ids, *completed_results = await pipe.execute()
+            completed_ids = self._merge_completed_ids(completed_results, limit)
 
-            for job_data in job_data_list:
-                try:
-                    parsed_data = json.loads(job_data)
-                    job = DramatiqJob(parsed_data)
-                    jobs.append(job)
-                except (json.JSONDecodeError, Exception) as e:
-                    logger.warning(f"Failed to parse job data: {e}")
-                    continue
-
-            # Get completed jobs from tracker
-            completed_jobs = await self._get_completed_jobs(limit=limit)
+            # The broker's queue list holds only message ids; encoded messages live in the queue's hash
+            job_data_list = []
+            if pending_ids:
+                job_data_list = await redis_client.hmget(self.keys.queue_messages(queue_name), pending_ids)
+            jobs = self._parse_jobs(job_data_list)
+            completed_jobs = await self._fetch_completed_jobs(completed_ids)
 
             # Filter by queue if needed
             if queue_name and queue_name != "default":
@@ -150,18 +248,29 @@ class DramatiqService:
         """Get a specific job by message ID"""
         try:
             redis_client = self._get_redis_client()
-            message_key = self._get_message_key(message_id)
-            result_key = self._get_result_key(message_id)
+
+            # The job tracker's lifecycle record covers every job enqueued through the broker
+            try:
+                record = await redis_client.hgetall(self.keys.job(message_id))
+            except ResponseError:
+                # Written before the tracker stored hashes, and not migrated yet
+                legacy_record = await redis_client.get(self.keys.job(message_id))
+                return DramatiqJob(json.loads(legacy_record)) if legacy_record else None
+            if record:
+                return DramatiqJob.from_record(record)
+
+            message_key = self.keys.message(message_id)
+            result_key = self.keys.result(message_id)
 
             # Get job data
-            job_data = redis_client.get(message_key)
+            job_data = await redis_client.get(message_key)
             if not job_data:
                 return None
 
             parsed_data = json.loads(job_data)
 
             # Get result if available
-            result_data = redis_client.get(result_key)
+            result_data = await redis_client.get(result_key)
             if result_data:
                 try:
                     parsed_data['result'] = json.loads(result_data)
@@ -173,25 +282,55 @@ class DramatiqService:
             logger.error(f"Failed to get job {message_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to retrieve job: {str(e)}")
 
-    async def get_queue_stats(self, queue_name: str = "default") -> Dict[str, Any]:
-        """Get statistics for a specific queue"""
+    async def get_job_progress(self, message_id: str) -> Optional[Dict[str, Any]]:
+        """Get the progress a long-running job has reported to the job tracker"""
         try:
             redis_client = self._get_redis_client()
-            queue_key = self._get_queue_key(queue_name)
+            progress = await redis_client.hgetall(self.keys.progress(message_id))
+            if not progress:
+                return None
 
-            # Get queue length
-            queue_length = redis_client.llen(queue_key)
+            total = int(progress["total"]) if "total" in progress else None
+            processed = int(progress.get("processed", 0))
+            return {
+                "message_id": message_id,
+                "processed": processed,
+                "total": total,
+                "percent": round(processed / total * 100, 2) if total else None,
+                "failed": int(progress.get("failed", 0)),
+                "updated_at": progress.get("updated_at"),
+            }
+        except Exception as e:
+            logger.error(f"Failed to get progress for job {message_id}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to retrieve job progress: {str(e)}")
 
-            # Get jobs and calculate stats
-            jobs = await self.get_all_jobs(queue_name, limit=1000)
+    @staticmethod
+    def _status_counts(counters: Dict[str, str], prefix: str = "") -> Dict[str, int]:
+        return {status: int(counters.get(f"{prefix}{status}", 0)) for status in JOB_STATUSES}
 
+    async def get_queue_stats(self, queue_name: str = "default") -> Dict[str, Any]:
+        """Get statistics for a specific queue from the counters maintained by the job tracker"""
+        try:
+            redis_client = self._get_redis_client()
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.llen(self.keys.queue(queue_name))
+                pipe.hgetall(self.keys.queue_stats(queue_name))
+                queue_length, counters = await pipe.execute()
+
+            counts = self._status_counts(counters)
+            running = max(counts["running"], 0)
+            finished = sum(counts[status] for status in TERMINAL_STATUSES)
             stats = {
                 "queue_name": queue_name,
-                "total_jobs": len(jobs),
+                # Counters kept from before enqueues were tracked may exceed the enqueued count
+                "total_jobs": max(counts["enqueued"], queue_length + running + finished),
                 "pending_jobs": queue_length,
-                "completed_jobs": len([j for j in jobs if j.status == "completed"]),
-                "failed_jobs": len([j for j in jobs if j.status == "failed"]),
-                "running_jobs": len([j for j in jobs if j.status == "running"]),
+                "completed_jobs": counts["completed"],
+                "failed_jobs": counts["failed"],
+                "running_jobs": running,
+                "retrying_jobs": counts["retrying"],
+                "cancelled_jobs": counts["cancelled"],
             }
 
             return stats
@@ -199,97 +338,247 @@ class DramatiqService:
             logger.error(f"Failed to get queue stats for {queue_name}: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to get queue stats: {str(e)}")
 
-    async def get_all_queues(self) -> List[str]:
-        """Get list of all available queues"""
+    async def get_actor_stats(self, actor_name: str) -> Dict[str, Any]:
+        """Get job counts by status for a specific actor"""
         try:
             redis_client = self._get_redis_client()
-            pattern = f"{self.namespace}:queue:*"
-            keys = redis_client.keys(pattern)
+            counters = await redis_client.hgetall(self.keys.actor_stats(actor_name))
+            return {"actor_name": actor_name, **self._status_counts(counters)}
+        except Exception as e:
+            logger.error(f"Failed to get actor stats for {actor_name}: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to get actor stats: {str(e)}")
+
+    async def get_stats_rollup(
+            self, granularity: Granularity = "minute", periods: int = 60, queue_name: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Get job counts by status for the most recent time buckets, oldest first"""
+        try:
+            redis_client = self._get_redis_client()
+            max_periods = ROLLUP_RETENTION[granularity] // BUCKET_SECONDS[granularity]
+            current = JobKeys.bucket(granularity, datetime.now(UTC))
+            buckets = list(range(current - min(periods, max_periods) + 1, current + 1))
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for bucket in buckets:
+                    pipe.hgetall(self.keys.rollup(granularity, bucket))
+                rollups = await pipe.execute()
+
+            prefix = f"{queue_name}:" if queue_name else ""
+            return [
+                {
+                    "bucket_start": datetime.fromtimestamp(bucket * BUCKET_SECONDS[granularity], UTC).isoformat(),
+                    **self._status_counts(counters, prefix),
+                }
+                for bucket, counters in zip(buckets, rollups)
+            ]
+        except Exception as e:
+            logger.error(f"Failed to get {granularity} stats rollup: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to get stats rollup: {str(e)}")
+
+    @staticmethod
+    def _latency_summary(histogram: List[int]) -> Dict[str, Any]:
+        """
+        Count and percentiles of a latency histogram.
+
+        Percentiles are the upper bound of the bucket they fall in, in milliseconds, or None
+        when they fall in the overflow bucket past the last bound.
+        """
+        count = sum(histogram)
+        summary: Dict[str, Any] = {"count": count}
+        for percentile in LATENCY_PERCENTILES:
+            value = None
+            if count:
+                rank = count * percentile / 100
+                seen = 0
+                for index, bucket_count in enumerate(histogram):
+                    seen += bucket_count
+                    if seen >= rank:
+                        value = LATENCY_BOUNDS_MS[index] if index < len(LATENCY_BOUNDS_MS) else None
+                        break
+            summary[f"p{percentile}_ms"] = value
+        return summary
+
+    async def get_latency(
+            self,
+            windows: Iterable[int] = (5, 15, 60),
+            actor_name: Optional[str] = None,
+            queue_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Get queue-wait and run-time percentiles over sliding windows of recent minutes.
+
+        Args:
+            windows: Window lengths in minutes, capped at the histogram retention
+            actor_name: Only include jobs of this actor
+            queue_name: Only include jobs from this queue
+        """
+        try:
+            redis_client = self._get_redis_client()
+            max_minutes = LATENCY_RETENTION // BUCKET_SECONDS["minute"]
+            windows = sorted({min(window, max_minutes) for window in windows})
+            current = JobKeys.bucket("minute", datetime.now(UTC))
+            # Newest minute first, so each window is a prefix of the fetched buckets
+            buckets = list(range(current, current - windows[-1], -1))
+            kinds = ("wait", "run")
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for kind in kinds:
+                    for bucket in buckets:
+                        pipe.hgetall(self.keys.latency(kind, bucket))
+                results = await pipe.execute()
+
+            summaries: Dict[int, Dict[str, Any]] = {window: {"window_minutes": window} for window in windows}
+            for kind_index, kind in enumerate(kinds):
+                histogram = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+                minute_hashes = results[kind_index * len(buckets):(kind_index + 1) * len(buckets)]
+                for minutes, counters in enumerate(minute_hashes, start=1):
+                    for field, value in counters.items():
+                        field_queue, field_actor, bucket_index = field.rsplit(":", 2)
+                        if queue_name and field_queue != queue_name:
+                            continue
+                        if actor_name and field_actor != actor_name:
+                            continue
+                        histogram[int(bucket_index)] += int(value)
+                    if minutes in summaries:
+                        summaries[minutes][kind] = self._latency_summary(histogram)
+
+            return {
+                "actor_name": actor_name,
+                "queue_name": queue_name,
+                "bucket_bounds_ms": list(LATENCY_BOUNDS_MS),
+                "windows": list(summaries.values()),
+            }
+        except Exception as e:
+            logger.error(f"Failed to get job latency: {e}")
+            raise HTTPException(status_code=500, detail=f"Failed to get job latency: {str(e)}")
 
-            # Extract queue names
-            queues = []
-            for key in keys:
-                queue_name = key.replace(f"{self.namespace}:queue:", "")
-                queues.append(queue_name)
+    async def get_all_queues(self) -> List[str]:
+        """Get list of all available queues from the queue registry"""
+        try:
+            redis_client = self._get_redis_client()
+            queues = await redis_client.smembers(self.keys.queue_registry())
+            if not queues:
+                queues = await self.reconcile_queues()
 
-            return queues if queues else ["default"]
+            return sorted(queues) if queues else ["default"]
         except Exception as e:
             logger.error(f"Failed to get queues: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to get queues: {str(e)}")
 
-    async def cancel_job(self, message_id: str) -> bool:
-        """Cancel a pending job"""
+    async def reconcile_queues(self) -> List[str]:
+        """
+        Rebuild the queue registry from the queues declared on the broker and the queue message hashes
+        present in Redis.
+
+        Uses incremental SCAN rather than KEYS so Redis keeps serving the broker during the walk.
+        """
+        redis_client = self._get_redis_client()
+        queues = {q_name(queue) for queue in dramatiq.get_broker().get_declared_queues()}
+        async for key in redis_client.scan_iter(match=self.keys.queue_messages_pattern(), count=1000):
+            queue = self.keys.queue_name_from_messages_key(key)
+            if queue:
+                queues.add(queue)
+        if queues:
+            await redis_client.sadd(self.keys.queue_registry(), *queues)
+        return sorted(queues)
+
+    def _queue_message_keys(self, queue_name: str) -> List[str]:
+        """Id list and message hash of a queue and of its delay queue, in REMOVE_FROM_QUEUE_SCRIPT order"""
+        delay_queue = dq_name(queue_name)
+        return [
+            self.keys.queue(queue_name), self.keys.queue_messages(queue_name),
+            self.keys.queue(delay_queue), self.keys.queue_messages(delay_queue),
+        ]
+
+    async def cancel_job(
+            self, message_id: str, remove_from_queue: bool = False, queue_name: Optional[str] = None
+    ) -> bool:
+        """
+        Cancel a pending job by adding it to the cancellation set, which workers check before running it.
+
+        Returns False for unknown ids and for jobs that are running or finished. With remove_from_queue,
+        the message is also deleted from its queue (up to dramatiq_cancel_scan_max_length messages long)
+        by a Lua script, so it stops showing as pending.
+        """
         try:
             redis_client = self._get_redis_client()
 
-            # Find and remove job from all queues
-            queues = await self.get_all_queues()
-            for queue_name in queues:
-                queue_key = self._get_queue_key(queue_name)
-                jobs = redis_client.lrange(queue_key, 0, -1)
-
-                for i, job_data in enumerate(jobs):
-                    try:
-                        parsed_data = json.loads(job_data)
-                        if parsed_data.get('message_id') == message_id:
-                            # Remove job from queue
-                            redis_client.lrem(queue_key, 1, job_data)
-
-                            # Mark as cancelled in message store
-                            message_key = self._get_message_key(message_id)
-                            parsed_data['cancelled_at'] = datetime.utcnow().isoformat()
-                            redis_client.set(message_key, json.dumps(parsed_data))
-
-                            return True
-                    except json.JSONDecodeError:
-                        continue
-
-            return False
+            # Only jobs the tracker knows as pending or retrying can be cancelled
+            try:
+                status, redis_message_id, job_queue = await redis_client.hmget(
+                    self.keys.job(message_id), ["status", "redis_message_id", "queue_name"]
+                )
+            except ResponseError:
+                # Legacy JSON records were only written for finished jobs
+                return False
+            if status not in CANCELLABLE_STATUSES:
+                return False
+
+            now = datetime.now(UTC).timestamp()
+            cancelled_key = self.keys.cancelled_set()
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.zadd(cancelled_key, {message_id: now + settings.dramatiq_cancellation_ttl})
+                pipe.zremrangebyscore(cancelled_key, "-inf", now)
+                await pipe.execute()
+
+            if remove_from_queue and redis_message_id:
+                # The broker's queue list and hash are keyed by the id it assigned on the last enqueue
+                remove = redis_client.register_script(REMOVE_FROM_QUEUE_SCRIPT)
+                await remove(
+                    keys=self._queue_message_keys(queue_name or job_queue),
+                    args=[redis_message_id, settings.dramatiq_cancel_scan_max_length],
+                )
+
+            return True
         except Exception as e:
             logger.error(f"Failed to cancel job {message_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to cancel job: {str(e)}")
 
     async def retry_failed_job(self, message_id: str) -> bool:
-        """Retry a failed job"""
+        """Retry a failed job by enqueueing its message again through the broker, under the same id"""
         try:
             job = await self.get_job_by_id(message_id)
             if not job or job.status != "failed":
                 return False
 
-            redis_client = self._get_redis_client()
-            queue_key = self._get_queue_key(job.queue_name)
-
-            # Reset job status and add back to queue
-            job_data = job.to_dict()
-            job_data['failed_at'] = None
-            job_data['error'] = None
-            job_data['retries'] = job_data.get('retries', 0) + 1
-
-            # Add back to queue
-            redis_client.lpush(queue_key, json.dumps(job_data))
-
-            # Update message store
-            message_key = self._get_message_key(message_id)
-            redis_client.set(message_key, json.dumps(job_data))
-
+            message = Message(
+                queue_name=job.queue_name,
+                actor_name=job.actor_name,
+                args=tuple(job.args),
+                kwargs=job.kwargs,
+                options={},
+                message_id=message_id,
+                message_timestamp=current_millis(),
+            )
+            # The broker client is synchronous; keep the enqueue off the event loop
+            await asyncio.to_thread(dramatiq.get_broker().enqueue, message)
             return True
         except Exception as e:
             logger.error(f"Failed to retry job {message_id}: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to retry job: {str(e)}")
 
     async def clear_queue(self, queue_name: str = "default") -> int:
-        """Clear all jobs from a queue"""
+        """
+        Clear all jobs from a queue, its delay queue and their dead-letter queues.
+
+        Deletes the same keys as RedisBroker.flush in one transaction and returns how many messages were
+        stored in the queue and its delay queue. Messages a worker has already fetched still run.
+        """
         try:
             redis_client = self._get_redis_client()
-            queue_key = self._get_queue_key(queue_name)
-
-            # Get count before clearing
-            count = redis_client.llen(queue_key)
-
-            # Clear the queue
-            redis_client.delete(queue_key)
-
-            return count
+            keys = []
+            for queue in (queue_name, dq_name(queue_name)):
+                keys += [self.keys.queue(queue), self.keys.queue_messages(queue)]
+            dead_letter = xq_name(queue_name)
+            keys += [self.keys.queue(dead_letter), self.keys.queue_messages(dead_letter)]
+
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.hlen(self.keys.queue_messages(queue_name))
+                pipe.hlen(self.keys.queue_messages(dq_name(queue_name)))
+                pipe.delete(*keys)
+                queued, delayed, _ = await pipe.execute()
+
+            return queued + delayed
         except Exception as e:
             logger.error(f"Failed to clear queue {queue_name}: {e}")
             raise HTTPException(status_code=500, detail=f"Failed to clear queue: {str(e)}")
@@ -298,7 +587,7 @@ class DramatiqService:
         """Get general broker information"""
         try:
             redis_client = self._get_redis_client()
-            info = redis_client.info()
+            info = await redis_client.info()
 
             broker_info = {
                 "redis_version": info.get("redis_version"),
@@ -0,0 +1,146 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+from loguru import logger
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.job_keys import JobKeys
+
+
+@dataclass(eq=False)
+class EventSubscriber:
+    """One connected event stream client with its own bounded buffer"""
+    queue_name: Optional[str] = None
+    actor_name: Optional[str] = None
+    buffer: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(settings.dramatiq_event_buffer_size))
+    dropped: int = 0
+    # Times the hub lost its Redis subscription while this client was connected; events may be missing
+    interruptions: int = 0
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        if self.queue_name and event.get("queue_name") != self.queue_name:
+            return False
+        if self.actor_name and event.get("actor_name") != self.actor_name:
+            return False
+        return True
+
+    def offer(self, event: Dict[str, Any]) -> None:
+        """Buffer an event without blocking; a slow client loses its oldest events instead of stalling the hub"""
+        if self.buffer.full():
+            self.buffer.get_nowait()
+            self.dropped += 1
+        self.buffer.put_nowait(event)
+
+
+class JobEventHub:
+    """
+    Fans job lifecycle events out from Redis pub/sub to live event stream clients.
+
+    One subscription per process is shared by every client. It starts with the first
+    subscriber and stops when the last one leaves. When the Redis connection fails it
+    resubscribes with exponential backoff, and clients are told events may have been missed.
+    """
+
+    def __init__(self, namespace: str, min_backoff_seconds: float = 0.5, max_backoff_seconds: float = 30.0):
+        self.channel = JobKeys(namespace).events_channel()
+        self.min_backoff_seconds = min_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._subscribers: set[EventSubscriber] = set()
+        self._listener: Optional[asyncio.Task] = None
+        # Consecutive failed subscriptions, reset once a subscription succeeds
+        self._failures = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, redis_client: Redis, queue_name: Optional[str] = None,
+                  actor_name: Optional[str] = None) -> EventSubscriber:
+        subscriber = EventSubscriber(queue_name=queue_name, actor_name=actor_name)
+        self._subscribers.add(subscriber)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen(redis_client))
+        return subscriber
+
+    async def unsubscribe(self, subscriber: EventSubscriber) -> None:
+        self._subscribers.discard(subscriber)
+        if not self._subscribers:
+            await self.stop()
+
+    async def stop(self) -> None:
+        if self._listener is not None and not self._listener.done():
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        self._listener = None
+
+    async def _listen(self, redis_client: Redis) -> None:
+        """Forward events to subscribers, resubscribing with backoff while any are connected"""
+        self._failures = 0
+        while self._subscribers:
+            try:
+                await self._forward(redis_client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failures += 1
+                delay = min(self.max_backoff_seconds, self.min_backoff_seconds * 2 ** (self._failures - 1))
+                logger.error(f"Job event subscription failed, resubscribing in {delay:.1f}s: {e}")
+                for subscriber in list(self._subscribers):
+                    subscriber.interruptions += 1
+                await asyncio.sleep(delay)
+
+    async def _forward(self, redis_client: Redis) -> None:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self.channel)
+            self._failures = 0
+            while True:
+                # Poll with a timeout shorter than the socket timeout so an idle channel is not an error
+                message = await pubsub.get_message(timeout=1.0)
+                if message is None:
+                    continue
+                try:
+                    event = json.loads(message["data"])
+                except (json.JSONDecodeError, TypeError) as e:
+                    logger.warning(f"Dropping malformed job event: {e}")
+                    continue
+                for subscriber in list(self._subscribers):
+                    if subscriber.wants(event):
+                        subscriber.offer(event)
+        finally:
+            await pubsub.aclose()
+
+    async def stream(self, subscriber: EventSubscriber, heartbeat_seconds: float) -> AsyncIterator[str]:
+        """
+        Yield Server-Sent Events for a subscriber, with keep-alive comments while idle.
+
+        An ``interrupted`` event tells the client the hub lost its subscription and events may be
+        missing, so it should reload the job list.
+        """
+        reported_dropped = 0
+        reported_interruptions = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.buffer.get(), timeout=heartbeat_seconds)
+            except asyncio.TimeoutError:
+                event = None
+            if subscriber.interruptions > reported_interruptions:
+                yield f"event: interrupted\ndata: {json.dumps({'count': subscriber.interruptions - reported_interruptions})}\n\n"
+                reported_interruptions = subscriber.interruptions
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            if subscriber.dropped > reported_dropped:
+                yield f"event: dropped\ndata: {json.dumps({'count': subscriber.dropped - reported_dropped})}\n\n"
+                reported_dropped = subscriber.dropped
+            yield f"event: job\nid: {event['message_id']}\ndata: {json.dumps(event)}\n\n"
+
+
+# Shared per process so all clients share one Redis subscription
+job_event_hub = JobEventHub(settings.dramatiq_namespace)
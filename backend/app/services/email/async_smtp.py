@@ -0,0 +1,133 @@
+import asyncio
+import time
+import weakref
+from dataclasses import dataclass, field
+from typing import List
+
+import aiosmtplib
+from loguru import logger
+
+from app.core.config import settings
+
+try:
+    from datadog import statsd
+    DATADOG_AVAILABLE = True
+except ImportError:
+    DATADOG_AVAILABLE = False
+
+# Errors after which a connection is discarded rather than returned to the pool
+CONNECTION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError)
+# Rejections the server replied with; aiosmtplib resets the envelope, so the connection stays usable
+REPLY_ERRORS = (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPSenderRefused, aiosmtplib.SMTPDataError)
+
+
+@dataclass
+class _LoopState:
+    """Connections and concurrency limit for one event loop; asyncio objects cannot cross loops"""
+    semaphore: asyncio.Semaphore
+    idle: List[tuple[aiosmtplib.SMTP, float]] = field(default_factory=list)
+
+
+class AsyncSMTPTransport:
+    """
+    Native asyncio SMTP transport with bounded concurrency.
+
+    At most max_concurrency sends are in flight per event loop, each over its own authenticated
+    connection. Connections are reused until they sit idle for idle_timeout, and a send that fails
+    on a dropped connection is retried once on a fresh one. Every send reports its duration and
+    outcome to Datadog when available.
+    """
+
+    def __init__(self, max_concurrency: int = 20, idle_timeout: float = 60.0, timeout: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._states: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopState] = weakref.WeakKeyDictionary()
+
+    def _state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._states.get(loop)
+        if state is None:
+            state = self._states[loop] = _LoopState(semaphore=asyncio.Semaphore(self.max_concurrency))
+        return state
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=settings.smtp_host,
+            port=settings.smtp_port,
+            timeout=self.timeout,
+            use_tls=settings.smtp_ssl and not settings.smtp_tls,
+            start_tls=settings.smtp_tls,
+        )
+        await client.connect()
+        if settings.smtp_user:
+            try:
+                await client.login(settings.smtp_user, settings.smtp_password)
+            except Exception:
+                # Never leave a connected but unauthenticated client behind
+                await self._close(client)
+                raise
+        return client
+
+    async def _checkout(self, state: _LoopState) -> aiosmtplib.SMTP:
+        now = time.monotonic()
+        while state.idle:
+            client, last_used_at = state.idle.pop()
+            if client.is_connected and now - last_used_at <= self.idle_timeout:
+                return client
+            await self._close(client)
+        return await self._connect()
+
+    @staticmethod
+    async def _close(client: aiosmtplib.SMTP) -> None:
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+    async def _send_once(self, state: _LoopState, from_addr: str, to_addrs: List[str], message: str | bytes) -> dict:
+        client = await self._checkout(state)
+        try:
+            refused, _ = await client.sendmail(from_addr, to_addrs, message)
+        except REPLY_ERRORS:
+            state.idle.append((client, time.monotonic()))
+            raise
+        except Exception:
+            client.close()
+            raise
+        state.idle.append((client, time.monotonic()))
+        return refused
+
+    async def send(self, from_addr: str, to_addrs: List[str], message: str | bytes) -> dict:
+        """Send a rendered message; returns the refused recipients, like smtplib's sendmail"""
+        state = self._state()
+        async with state.semaphore:
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                try:
+                    refused = await self._send_once(state, from_addr, to_addrs, message)
+                except CONNECTION_ERRORS as e:
+                    logger.warning(f"SMTP connection lost, retrying on a new connection: {e}")
+                    refused = await self._send_once(state, from_addr, to_addrs, message)
+                outcome = "refused" if refused else "sent"
+                return refused
+            finally:
+                duration_ms = (time.perf_counter() - started) * 1000
+                logger.debug(f"SMTP send to {to_addrs} {outcome} in {duration_ms:.1f}ms")
+                if DATADOG_AVAILABLE:
+                    statsd.timing('email.send.duration', duration_ms, tags=[f'outcome:{outcome}'])
+
+    async def close(self) -> None:
+        """Close the idle connections of the running event loop"""
+        state = self._states.pop(asyncio.get_running_loop(), None)
+        if state:
+            await asyncio.gather(*(self._close(client) for client, _ in state.idle))
+
+
+# Shared per process; state is kept per event loop so the API and worker loops each get their own
+async_smtp_transport = AsyncSMTPTransport(
+    max_concurrency=settings.smtp_async_max_concurrency,
+    idle_timeout=settings.smtp_pool_idle_timeout,
+    timeout=settings.smtp_timeout,
+)
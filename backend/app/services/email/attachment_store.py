@@ -0,0 +1,127 @@
+import asyncio
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.core.config import settings
+from app.db.db_manager import db_manager
+from app.models.util.model import EmailAttachment
+
+
+class AttachmentTooLargeError(ValueError):
+    """An email's attachments add up to more than settings.email_attachment_max_bytes"""
+
+
+class AttachmentStore(ABC):
+    """
+    Claim-check storage for email attachments.
+
+    Attachment bytes are written once here and only the returned id travels in EmailData and job
+    payloads, so attachments never pass through Redis.
+    """
+
+    @abstractmethod
+    async def put(self, file_name: str, source: bytes | BinaryIO) -> str:
+        """Store bytes or a readable file object and return its attachment id"""
+
+    @abstractmethod
+    def stream(self, attachment_id: str) -> AsyncIterator[bytes]:
+        """Yield a stored attachment in chunks; raises 404 if it does not exist"""
+
+    @abstractmethod
+    async def delete(self, attachment_id: str) -> None:
+        """Delete a stored attachment; missing attachments are ignored"""
+
+    async def attach(self, file_name: str, source: bytes | BinaryIO, content_type: Optional[str] = None) -> EmailAttachment:
+        """Store an attachment and return the reference to put in EmailData; raises 413 when bytes are too large"""
+        if isinstance(source, bytes) and len(source) > settings.email_attachment_max_bytes:
+            raise HTTPException(
+                status_code=413, detail=f"Attachment exceeds {settings.email_attachment_max_bytes} bytes"
+            )
+        attachment_id = await self.put(file_name, source)
+        return EmailAttachment(file_name=file_name, attachment_id=attachment_id, content_type=content_type)
+
+
+class GridFSAttachmentStore(AttachmentStore):
+    """Attachments in a GridFS bucket of the application database, streamed in GridFS chunks"""
+
+    def __init__(self, bucket_name: str = "email_attachments"):
+        self.bucket_name = bucket_name
+
+    def _bucket(self) -> AsyncIOMotorGridFSBucket:
+        # Built per call so it is bound to the database (and event loop) of the current process
+        return AsyncIOMotorGridFSBucket(db_manager.database, bucket_name=self.bucket_name)
+
+    async def put(self, file_name: str, source: bytes | BinaryIO) -> str:
+        return str(await self._bucket().upload_from_stream(file_name, source))
+
+    async def stream(self, attachment_id: str) -> AsyncIterator[bytes]:
+        try:
+            grid_out = await self._bucket().open_download_stream(ObjectId(attachment_id))
+        except (InvalidId, NoFile):
+            raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} not found")
+        while chunk := await grid_out.readchunk():
+            yield chunk
+
+    async def delete(self, attachment_id: str) -> None:
+        try:
+            await self._bucket().delete(ObjectId(attachment_id))
+        except (InvalidId, NoFile):
+            pass
+
+
+class LocalAttachmentStore(AttachmentStore):
+    """Attachments as files in a local directory; a stand-in for GridFS in development"""
+
+    def __init__(self, directory: str, chunk_size: int = 255 * 1024):
+        self.directory = Path(directory)
+        # Same default as GridFS chunks
+        self.chunk_size = chunk_size
+
+    def _path(self, attachment_id: str) -> Path:
+        # Ids are generated hex strings; reject anything else so ids cannot escape the directory
+        try:
+            return self.directory / uuid.UUID(hex=attachment_id).hex
+        except ValueError:
+            raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} not found")
+
+    def _write(self, path: Path, source: bytes | BinaryIO) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as target:
+            if isinstance(source, bytes):
+                target.write(source)
+            else:
+                shutil.copyfileobj(source, target)
+
+    async def put(self, file_name: str, source: bytes | BinaryIO) -> str:
+        attachment_id = uuid.uuid4().hex
+        await asyncio.to_thread(self._write, self._path(attachment_id), source)
+        return attachment_id
+
+    async def stream(self, attachment_id: str) -> AsyncIterator[bytes]:
+        try:
+            source = await asyncio.to_thread(open, self._path(attachment_id), "rb")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} not found")
+        try:
+            while chunk := await asyncio.to_thread(source.read, self.chunk_size):
+                yield chunk
+        finally:
+            source.close()
+
+    async def delete(self, attachment_id: str) -> None:
+        await asyncio.to_thread(self._path(attachment_id).unlink, missing_ok=True)
+
+
+def get_attachment_store() -> AttachmentStore:
+    if settings.email_attachment_store == "local":
+        return LocalAttachmentStore(settings.email_attachment_dir)
+    return GridFSAttachmentStore()
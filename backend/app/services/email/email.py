@@ -1,84 +1,160 @@
-from pathlib import Path
-from jinja2 import  Environment, FileSystemLoader
-from typing import Any
+import base64
+import mimetypes
+import smtplib
+from email.mime.base import MIMEBase
+from typing import Any, List, Optional
+import aiosmtplib
 import emails
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 
 from app.core.config import settings
-from app.models.util.model import EmailData
-
+from app.models.util.model import EmailAttachment, EmailData, EmailTemplate
+from app.services.email.async_smtp import async_smtp_transport
+from app.services.email.attachment_store import AttachmentStore, AttachmentTooLargeError, get_attachment_store
+from app.services.email.smtp_pool import smtp_pool
+from app.services.email.templates import email_template_renderer
 
+# Raw bytes per base64 line; 57 bytes encode to one full 76-character MIME line
+BASE64_LINE_BYTES = 57
 
 
 class EmailService:
-    def __init__(self):
-        template_dir = Path(__file__).parent / "email-templates" / "built"
-        self.jinja_env = Environment(
-            loader=FileSystemLoader(template_dir),
-            autoescape=True
-        )
-        self.executor = ThreadPoolExecutor(max_workers=2)
+    def __init__(self, attachment_store: Optional[AttachmentStore] = None):
+        self.renderer = email_template_renderer
+        self.attachment_store = attachment_store or get_attachment_store()
 
     def render_email_template(self,
                               template_name: str,
                               context: dict[str, Any]) -> str:
+        """Render with the process-wide compiled templates; app_name and valid_minutes are shared globals"""
         try:
-            template = self.jinja_env.get_template(template_name)
-            return template.render(context)
+            return self.renderer.render(template_name, context)
         except Exception as e:
             logger.error(f"Failed to render email template {template_name}: {e}")
             raise
 
+    @staticmethod
+    def _recipients(email: EmailData) -> List[str]:
+        return [email.to] if isinstance(email.to, str) else list(email.to)
+
+    @staticmethod
+    def _build_message(email: EmailData) -> emails.Message:
+        return emails.Message(
+            subject=email.subject,
+            html=email.html_content,
+            mail_from=(settings.emails_from_name, settings.emails_from_email),
+            mail_to=email.to,
+        )
+
+    async def _write_attachment_part(self, buffer: bytearray, boundary: bytes, attachment: EmailAttachment,
+                                     max_bytes: int) -> int:
+        """
+        Append a stored attachment to buffer as a base64 MIME part, encoding each chunk as it streams.
+
+        Returns the raw bytes written; raises AttachmentTooLargeError past max_bytes.
+        """
+        content_type = attachment.content_type or mimetypes.guess_type(attachment.file_name)[0]
+        maintype, _, subtype = (content_type or "application/octet-stream").split(";")[0].strip().partition("/")
+        part = MIMEBase(maintype, subtype or "octet-stream")
+        part["Content-Transfer-Encoding"] = "base64"
+        part.add_header("Content-Disposition", "attachment", filename=attachment.file_name)
+        part.set_payload("")
+        buffer += b"--" + boundary + b"\n" + part.as_bytes()
+
+        size = 0
+        pending = b""
+        async for chunk in self.attachment_store.stream(attachment.attachment_id):
+            size += len(chunk)
+            if size > max_bytes:
+                raise AttachmentTooLargeError(f"Attachments exceed {settings.email_attachment_max_bytes} bytes")
+            pending += chunk
+            whole_lines = len(pending) - len(pending) % BASE64_LINE_BYTES
+            buffer += base64.encodebytes(pending[:whole_lines])
+            pending = pending[whole_lines:]
+        buffer += base64.encodebytes(pending)
+        return size
+
+    async def _build_message_async(self, email: EmailData) -> bytearray:
+        """
+        Render the message into a single buffer, encoding attachments straight into it as they stream.
+
+        The buffer is what gets sent, so a send holds the encoded message once (about 1.4x the raw
+        attachments) plus the copies aiosmtplib makes while normalizing line endings for DATA: roughly
+        four times settings.email_attachment_max_bytes at most.
+        """
+        message = self._build_message(email).as_message()
+        buffer = bytearray(message.as_bytes())
+        if not email.attachments:
+            return buffer
+
+        # Reopen the multipart before its closing delimiter and write the attachment parts in its place
+        boundary = message.get_boundary().encode("ascii")
+        del buffer[buffer.rfind(b"\n--" + boundary + b"--") + 1:]
+        remaining = settings.email_attachment_max_bytes
+        for attachment in email.attachments:
+            remaining -= await self._write_attachment_part(buffer, boundary, attachment, remaining)
+        buffer += b"--" + boundary + b"--\n"
+        return buffer
+
     async def send_email_async(self, email: EmailData) -> bool:
-        loop = asyncio.get_event_loop()
+        """
+        Send on the running event loop over the shared async SMTP transport.
+
+        Returns False when sending is disabled, every recipient was refused or the attachments are too
+        large; transport errors are raised so the calling job is retried.
+        """
+        if not settings.emails_enabled:
+            logger.warning("Email sending is disabled in settings")
+            return False
         try:
-            result = await loop.run_in_executor(self.executor, self._send_email_sync, email)
-            return result
-        except Exception as e:
+            message = await self._build_message_async(email)
+            refused = await async_smtp_transport.send(
+                settings.emails_from_email, self._recipients(email), message
+            )
+            if not refused:
+                logger.info(f"Email sent successfully to {email.to}")
+                return True
+            else:
+                logger.error(f"Failed to send email to {email.to}: {refused}")
+                return False
+
+        except aiosmtplib.SMTPRecipientsRefused as e:
+            # Every recipient was refused; a permanent failure that retrying cannot fix
+            logger.error(f"Failed to send email to {email.to}: {e.recipients}")
+            return False
+        except AttachmentTooLargeError as e:
             logger.error(f"Failed to send email to {email.to}: {e}")
             return False
+        except Exception as e:
+            logger.error(f"Failed to send email to {email.to}: {e}")
+            raise
 
     def _send_email_sync(self, email: EmailData) -> bool:
         if not settings.emails_enabled:
             logger.warning("Email sending is disabled in settings")
             return False
+        if email.attachments:
+            # Attachments are read from the async attachment store; use send_email_async or send_email_task
+            raise ValueError("Emails with attachments must be sent with send_email_async")
         try:
-            message = emails.Message(
-                subject=email.subject,
-                html=email.html_content,
-                mail_from=(settings.emails_from_name, settings.emails_from_email),
-            )
+            message = self._build_message(email)
 
-            for attachment in email.attachments or []:
-                message.attach(filename=attachment.file_name, data=attachment.file_data)
-            smtp_options = {
-                "host": settings.smtp_host,
-                "port": settings.smtp_port,
-                "timeout": 30  # Add timeout
-            }
-            if settings.smtp_tls:
-                smtp_options["tls"] = True
-            elif settings.smtp_ssl:
-                smtp_options["ssl"] = True
-
-            if settings.smtp_user:
-                smtp_options["user"] = settings.smtp_user
-            if settings.smtp_password:
-                smtp_options["password"] = settings.smtp_password
-
-            response = message.send(to=email.to, smtp=smtp_options)
-            if response.status_code == 250:
+            # Sent over a pooled, already authenticated connection instead of a new one per email
+            refused = smtp_pool.send(settings.emails_from_email, self._recipients(email), message.as_string())
+            if not refused:
                 logger.info(f"Email sent successfully to {email.to}")
                 return True
             else:
-                logger.error(f"Failed to send email to {email.to}: {response}")
+                logger.error(f"Failed to send email to {email.to}: {refused}")
                 return False
 
+        except smtplib.SMTPRecipientsRefused as e:
+            # Every recipient was refused; a permanent failure that retrying cannot fix
+            logger.error(f"Failed to send email to {email.to}: {e.recipients}")
+            return False
         except Exception as e:
             logger.error(f"Error sending email to {email.to}: {e}")
-            return False
+            raise
 
     def send_email(self, email: EmailData) -> bool:
         return self._send_email_sync(email)
@@ -89,9 +165,7 @@ class EmailService:
         logger.debug(f"Generated reset link: {link}")
         context = {
             "reset_email": reset_email,
-            "valid_minutes": settings.email_reset_token_expire_minutes,
             "reset_link": link,
-            "app_name": getattr(settings, 'app_name', 'Your App'),
         }
         logger.debug(f"Template context: {context}")
         html_content = self.render_email_template(
@@ -107,9 +181,7 @@ class EmailService:
             template_name="magic_link.html",
             context={
                 "user_email": user_email,
-                "valid_minutes": settings.email_reset_token_expire_minutes,
                 "magic_link": link,
-                "app_name": getattr(settings, 'app_name', 'Your App'),
             }
         )
         return EmailData(to=user_email, html_content=html_content, subject=subject)
@@ -121,14 +193,21 @@ class EmailService:
             template_name="welcome_email.html",
             context={
                 "user_email": user_email,
-                "valid_minutes": settings.email_reset_token_expire_minutes,
                 "setup_link": link,
-                "app_name": getattr(settings, 'app_name', 'Your App'),
             },
         )
         return EmailData(to=user_email, html_content=html_content, subject=subject)
 
 
+    def generate_email(self, template: EmailTemplate, user_email: str, token: str) -> EmailData:
+        if template == EmailTemplate.welcome:
+            return self.generate_welcome_email(user_email, token)
+        elif template == EmailTemplate.reset_password:
+            return self.generate_reset_password_email(user_email, token)
+        elif template == EmailTemplate.magic_link:
+            return self.generate_magic_link_email(user_email, token)
+        raise ValueError(f"Unknown email template: {template}")
+
     async def send_welcome_email(self, user_email: str, token: str) -> bool:
         email_data = self.generate_welcome_email(user_email, token)
         return await self.send_email_async(email_data)
@@ -140,7 +219,3 @@ class EmailService:
     async def send_magic_link_email(self, user_email: str, token: str) -> bool:
         email_data = self.generate_magic_link_email(user_email, token)
         return await self.send_email_async(email_data)
-
-    def __del__(self):
-        if hasattr(self, 'executor'):
-            self.executor.shutdown(wait=False)
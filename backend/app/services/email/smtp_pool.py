@@ -0,0 +1,152 @@
+import atexit
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+
+from loguru import logger
+
+from app.core.config import settings
+
+# Errors after which a connection is discarded rather than returned to the pool
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError)
+# Rejections the server replied with; smtplib raises them as OSError subclasses, but the connection is
+# still usable and resending the same message would be rejected again
+REPLY_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+@dataclass
+class PooledConnection:
+    client: smtplib.SMTP
+    last_used_at: float
+
+
+class SMTPConnectionPool:
+    """
+    Thread-safe pool of authenticated SMTP connections, one per worker process.
+
+    Connections are reused across sends so a burst of emails pays the TLS handshake and AUTH once per
+    connection instead of once per message. Idle connections past idle_timeout are closed, connections
+    idle for longer than health_check_after are checked with NOOP before reuse, and a send that fails
+    on a dropped connection is retried once on a fresh one.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 4,
+        idle_timeout: float = 60.0,
+        health_check_after: float = 5.0,
+        timeout: float = 30.0,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self._idle: List[PooledConnection] = []
+        self._lock = threading.Lock()
+        # Bounds open connections (idle + checked out) so bursts cannot exceed the provider's limit
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _connect(self) -> smtplib.SMTP:
+        if settings.smtp_ssl and not settings.smtp_tls:
+            client = smtplib.SMTP_SSL(
+                settings.smtp_host, settings.smtp_port, timeout=self.timeout, context=ssl.create_default_context()
+            )
+        else:
+            client = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=self.timeout)
+        try:
+            if settings.smtp_tls:
+                client.starttls(context=ssl.create_default_context())
+            if settings.smtp_user:
+                client.login(settings.smtp_user, settings.smtp_password)
+        except Exception:
+            # Never leave a connected but unencrypted or unauthenticated client behind
+            self._close(PooledConnection(client=client, last_used_at=time.monotonic()))
+            raise
+        return client
+
+    @staticmethod
+    def _close(connection: PooledConnection) -> None:
+        try:
+            connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+    @staticmethod
+    def _is_healthy(connection: PooledConnection) -> bool:
+        try:
+            return connection.client.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _checkout(self) -> PooledConnection:
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                connection = self._idle.pop() if self._idle else None
+            if connection is None:
+                client = self._connect()
+                return PooledConnection(client=client, last_used_at=now)
+            idle_for = now - connection.last_used_at
+            if idle_for > self.idle_timeout:
+                self._close(connection)
+            elif idle_for > self.health_check_after and not self._is_healthy(connection):
+                connection.client.close()
+            else:
+                return connection
+
+    def _checkin(self, connection: PooledConnection) -> None:
+        connection.last_used_at = time.monotonic()
+        with self._lock:
+            self._idle.append(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """Borrow a connection; it is discarded instead of returned if the connection drops"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("Timed out waiting for a pooled SMTP connection")
+        connection: Optional[PooledConnection] = None
+        try:
+            connection = self._checkout()
+            yield connection.client
+        except REPLY_ERRORS:
+            raise
+        except CONNECTION_ERRORS:
+            if connection:
+                connection.client.close()
+                connection = None
+            raise
+        finally:
+            if connection:
+                self._checkin(connection)
+            self._slots.release()
+
+    def send(self, from_addr: str, to_addrs: List[str], message: str) -> dict:
+        """Send a rendered message, reconnecting once if the pooled connection has dropped"""
+        try:
+            with self.connection() as client:
+                return client.sendmail(from_addr, to_addrs, message)
+        except REPLY_ERRORS:
+            raise
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"SMTP connection lost, retrying on a new connection: {e}")
+            with self.connection() as client:
+                return client.sendmail(from_addr, to_addrs, message)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close(connection)
+
+
+# One pool per process; connections are never shared across forked workers
+smtp_pool = SMTPConnectionPool(
+    max_size=settings.smtp_pool_max_size,
+    idle_timeout=settings.smtp_pool_idle_timeout,
+    timeout=settings.smtp_timeout,
+)
+atexit.register(smtp_pool.close_all)
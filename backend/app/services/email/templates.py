@@ -0,0 +1,79 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from loguru import logger
+
+from app.core.config import settings, Mode
+
+try:
+    from datadog import statsd
+    DATADOG_AVAILABLE = True
+except ImportError:
+    DATADOG_AVAILABLE = False
+
+TEMPLATE_DIR = Path(__file__).parent / "email-templates" / "built"
+
+
+class EmailTemplateRenderer:
+    """
+    Process-wide Jinja environment for email templates.
+
+    Templates are compiled once per process and kept in the environment's cache, optionally backed by
+    an on-disk bytecode cache so new worker processes skip compilation too. Outside dev mode templates
+    are not re-checked on disk for every render. Values shared by every email, such as app_name, are
+    environment globals instead of being rebuilt into each render context.
+    """
+
+    def __init__(self, template_dir: Path, bytecode_cache_dir: Optional[str] = None, auto_reload: bool = False):
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            Path(bytecode_cache_dir).mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            autoescape=True,
+            auto_reload=auto_reload,
+            bytecode_cache=bytecode_cache,
+        )
+        self.env.globals.update({
+            "app_name": settings.app_name,
+            "valid_minutes": settings.email_reset_token_expire_minutes,
+        })
+        self._loaded: set[str] = set()
+        self._lock = threading.Lock()
+
+    def warm(self) -> int:
+        """Compile every template up front, e.g. at worker boot, so the first emails skip compilation"""
+        names = self.env.list_templates(extensions=["html"])
+        for name in names:
+            self.env.get_template(name)
+        with self._lock:
+            self._loaded.update(names)
+        logger.info(f"Warmed {len(names)} email templates")
+        return len(names)
+
+    def render(self, template_name: str, context: dict[str, Any]) -> str:
+        cache_hit = template_name in self._loaded
+        started = time.perf_counter()
+        html = self.env.get_template(template_name).render(context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if not cache_hit:
+            with self._lock:
+                self._loaded.add(template_name)
+
+        if DATADOG_AVAILABLE:
+            tags = [f'template:{template_name}']
+            statsd.timing('email.template.render', duration_ms, tags=tags)
+            statsd.increment('email.template.cache', tags=[*tags, f'result:{"hit" if cache_hit else "miss"}'])
+        return html
+
+
+# Shared per process so templates are compiled once, not once per EmailService
+email_template_renderer = EmailTemplateRenderer(
+    TEMPLATE_DIR,
+    bytecode_cache_dir=settings.email_template_bytecode_cache_dir,
+    auto_reload=settings.mode == Mode.dev,
+)
@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from typing import List, Optional, Tuple
+
+import dramatiq
+from dramatiq.errors import ActorNotFound
+from loguru import logger
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+
+from app.core.config import settings
+from app.models.outbox.model import OutboxMessage, OutboxStatus
+
+
+class OutboxRelay:
+    """
+    Drains the outbox into the broker in batches.
+
+    Requests only write an OutboxMessage to Mongo and call notify(); this relay claims pending messages,
+    collapses those sharing a dedupe key to the newest and enqueues them one by one, marking each sent as
+    soon as the broker has it, so request latency does not depend on Redis. A message that cannot be
+    enqueued does not hold up the rest of its batch: it is retried after the claim timeout and marked failed
+    after max_attempts, or at once if its actor does not exist. Delivery is at least once: a relay stopped
+    between enqueueing and marking a message leaves it to be claimed again after the claim timeout.
+    """
+
+    def __init__(self, batch_size: int = 100, poll_interval: float = 1.0, claim_timeout: int = 60,
+                 max_attempts: int = 5):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.claim_timeout = claim_timeout
+        self.max_attempts = max_attempts
+        self.relay_id = uuid.uuid4().hex
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    def notify(self) -> None:
+        """Wake the relay now instead of at its next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # Keep draining while batches come back full
+                while await self.relay_batch() == self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def relay_batch(self) -> int:
+        """Claim and enqueue one batch; returns how many outbox messages it handled"""
+        claimed = await OutboxMessage.claim_batch(
+            f"{self.relay_id}:{uuid.uuid4().hex}", self.batch_size, self.claim_timeout
+        )
+        if not claimed:
+            return 0
+
+        broker = dramatiq.get_broker()
+        to_send: List[OutboxMessage] = []
+        duplicates = []
+        seen_keys = set()
+        # Newest first, so a message superseded by a later one with the same key is the one dropped
+        for entry in reversed(claimed):
+            if entry.dedupe_key and entry.dedupe_key in seen_keys:
+                duplicates.append(entry.id)
+                continue
+            seen_keys.add(entry.dedupe_key)
+            to_send.append(entry)
+        to_send.reverse()
+
+        sent = 0
+        failures: List[Tuple[OutboxMessage, str, bool]] = []
+        try:
+            for entry in to_send:
+                try:
+                    message = broker.get_actor(entry.actor_name).message(*entry.args, **entry.kwargs)
+                    # The broker client is synchronous; keep the enqueue off the event loop
+                    message = await asyncio.to_thread(broker.enqueue, message)
+                except (RedisConnectionError, RedisTimeoutError):
+                    # The broker is down, not this message; the rest of the batch is reclaimed after the timeout
+                    raise
+                except Exception as e:
+                    logger.warning(f"Outbox message {entry.id} for {entry.actor_name} was not enqueued: {e}")
+                    failures.append((entry, repr(e), isinstance(e, ActorNotFound)))
+                    continue
+                await OutboxMessage.mark([entry.id], OutboxStatus.sent, {entry.id: message.message_id})
+                sent += 1
+        finally:
+            await OutboxMessage.mark(duplicates, OutboxStatus.deduplicated)
+            failed = await OutboxMessage.record_failures(failures, self.max_attempts)
+        logger.debug(f"Outbox relayed {sent} messages, {len(duplicates)} deduplicated, {len(failures)} not enqueued")
+        if failed:
+            logger.error(f"Outbox marked {failed} messages failed")
+        return len(claimed)
+
+
+async def send_via_outbox(actor: dramatiq.Actor, *args, dedupe_key: Optional[str] = None, **kwargs) -> None:
+    """Queue an actor call through the outbox instead of calling actor.send() inside the request"""
+    await OutboxMessage.add(actor.actor_name, *args, dedupe_key=dedupe_key, **kwargs)
+    outbox_relay.notify()
+
+
+# One relay per API process; claims keep concurrent relays in other processes from double-sending
+outbox_relay = OutboxRelay(
+    batch_size=settings.outbox_batch_size,
+    poll_interval=settings.outbox_poll_interval,
+    claim_timeout=settings.outbox_claim_timeout,
+    max_attempts=settings.outbox_max_attempts,
+)
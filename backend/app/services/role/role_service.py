@@ -1,10 +1,12 @@
 from typing import List
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from starlette import status
 
+from app.core.config import settings
 from app.models.role.model import Role, RoleBase, RoleOut
-from app.models.user.model import User
-from app.models.util.model import Message
+from app.models.user.model import User, UserSelection
+from app.models.util.model import Message, BulkUpdateResult, BatchLookupResult, object_id_key
 from app.tasks.background_tasks import ensure_ri_delete_role
 
 
@@ -26,6 +28,12 @@ class RoleService:
             raise HTTPException(status_code=404, detail="Role not found")
         return RoleOut.model_validate(role.model_dump())
 
+    async def lookup_roles_by_ids(self, role_ids: List[str]) -> BatchLookupResult[RoleOut]:
+        """Look up many roles by ID in one query, reporting the ones that were not found"""
+        roles = await Role.by_ids(role_ids)
+        found = {str(role.id): RoleOut.model_validate(role.model_dump()) for role in roles}
+        return BatchLookupResult[RoleOut].from_found(role_ids, found, normalize=object_id_key)
+
     async def get_role_by_name(self, name: str) -> Role:
         """Get a role by its name"""
         role = await Role.by_name(name)
@@ -34,17 +42,16 @@ class RoleService:
         return role
 
     async def create_role(self, role_data: RoleBase, created_by: str) -> RoleOut:
-        """Create a new role"""
-        existing_role = await Role.by_name(role_data.name)
-        if existing_role:
+        """Create a new role, relying on the unique name index to reject duplicates"""
+        role_data.created_by = created_by
+        new_role = Role(**role_data.model_dump())
+        try:
+            await new_role.insert()
+        except DuplicateKeyError:
             raise HTTPException(
                 status_code=400,
                 detail="Role name already exists",
             )
-
-        role_data.created_by = created_by
-        new_role = Role(**role_data.model_dump())
-        await new_role.insert()
         return RoleOut.model_validate(new_role.model_dump())
 
     async def update_role(self, role_id: str, role_update: RoleBase) -> RoleOut:
@@ -53,14 +60,12 @@ class RoleService:
         if not role:
             raise HTTPException(status_code=404, detail="Role not found")
 
-        # Check if updating name to an existing name
-        if role_update.name and role_update.name != role.name:
-            existing_role = await Role.by_name(role_update.name)
-            if existing_role:
-                raise HTTPException(status_code=400, detail="Role name already exists")
-
         update_data = role_update.model_dump(exclude_unset=True)
-        await role.update({"$set": update_data})
+        # Renaming to an existing name is rejected by the unique name index
+        try:
+            await role.update({"$set": update_data})
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Role name already exists")
 
         # Fetch updated role
         updated_role = await Role.by_id(role_id)
@@ -71,7 +76,7 @@ class RoleService:
         role = await Role.by_id(role_id)
         if not role:
             raise HTTPException(status_code=404, detail="Role not found")
-        user_count = await User.find({"roles": role_id}).count()
+        user_count = await User.find({"roles": role.id}).count()
         await role.delete()
         # Start background cleanup task
         ensure_ri_delete_role.send(role_id)
@@ -80,6 +85,30 @@ class RoleService:
         else:
             return Message(message="Role deleted successfully.")
 
+    async def assign_role(self, role_id: str, selection: UserSelection) -> BulkUpdateResult:
+        """Add a role to every selected user with chunked $addToSet writes"""
+        role = await Role.by_id(role_id)
+        if not role:
+            raise HTTPException(status_code=404, detail="Role not found")
+        matched, modified = await User.update_in_chunks(
+            selection.to_query(),
+            {"$addToSet": {"roles": role.id}},
+            chunk_size=settings.bulk_update_chunk_size,
+        )
+        return BulkUpdateResult(matched=matched, modified=modified)
+
+    async def revoke_role(self, role_id: str, selection: UserSelection) -> BulkUpdateResult:
+        """Remove a role from every selected user holding it with chunked $pull writes"""
+        role = await Role.by_id(role_id)
+        if not role:
+            raise HTTPException(status_code=404, detail="Role not found")
+        matched, modified = await User.update_in_chunks(
+            {**selection.to_query(), "roles": role.id},
+            {"$pull": {"roles": role.id}},
+            chunk_size=settings.bulk_update_chunk_size,
+        )
+        return BulkUpdateResult(matched=matched, modified=modified)
+
     async def role_exists(self, role_id: str) -> bool:
         """Check if a role exists by ID"""
         role = await Role.by_id(role_id)
@@ -87,9 +116,4 @@ class RoleService:
 
     async def get_roles_by_ids(self, role_ids: List[str]) -> List[Role]:
         """Get multiple roles by their IDs"""
-        roles = []
-        for role_id in role_ids:
-            role = await Role.by_id(role_id)
-            if role:
-                roles.append(role)
-        return roles
\ No newline at end of file
+        return await Role.by_ids(role_ids)
\ No newline at end of file
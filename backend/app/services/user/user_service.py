@@ -1,17 +1,20 @@
 from typing import List
 from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
 from starlette import status
 
 from app.core.security.api import verify_password, get_hashed_password, password_context
 from app.models.auth.model import Token
 from app.models.magic_link.model import MagicLink, MagicType
 from app.models.role.model import Role
-from app.models.user.model import UserAuth, User, UserBase, UserOut, APIKey, UpdateAPIKey, UserUpdateRequest, CreateAPIKey
-from app.models.util.model import Message
+from app.models.user.model import UserAuth, User, UserBase, UserOut, APIKey, UpdateAPIKey, UserUpdateRequest, CreateAPIKey, \
+    BulkEmailRequest
+from app.models.util.model import Message, BatchLookupResult, object_id_key
 from app.services.auth.auth_service import AuthService
 from app.services.email.email import EmailService
+from app.services.outbox.relay import send_via_outbox
 from app.tasks.background_tasks import send_welcome_email_task, send_reset_password_email_task, \
-    send_magic_link_email_task
+    send_magic_link_email_task, send_bulk_email_task
 
 
 class UserService:
@@ -40,24 +43,38 @@ class UserService:
         user = await User.by_email(email)
         return user
 
+    async def lookup_users_by_ids(self, user_ids: List[str]) -> BatchLookupResult[UserBase]:
+        users = await User.by_ids(user_ids)
+        return BatchLookupResult[UserBase].from_found(
+            user_ids, {str(user.id): user for user in users}, normalize=object_id_key
+        )
+
+    async def lookup_users_by_emails(self, emails: List[str]) -> BatchLookupResult[UserBase]:
+        users = await User.by_emails(emails)
+        return BatchLookupResult[UserBase].from_found(emails, {user.email: user for user in users})
+
     async def create_user(self, user_register: UserAuth):
-        if _ := await self.get_user_by_email(user_register.email):
+        # A known duplicate is rejected before role lookups and password hashing, so it keeps its 400
+        # and costs no bcrypt hash; the unique index below still catches concurrent registrations
+        if await User.by_email(user_register.email):
             raise HTTPException(
                 status_code=400,
                 detail="User already exists",
             )
-        for role in user_register.roles:
-            if not (_ := await Role.by_id(role)):
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Role with id {role} does not exist",
-                )
+        await Role.resolve(user_register.roles)
         hashed_password = get_hashed_password(user_register.password)
         user_register.password = hashed_password
         new_user = User(**user_register.model_dump())
-        await User.insert(new_user)
+        # Rely on the unique email index instead of a read-before-write, which races under concurrency
+        try:
+            await User.insert(new_user)
+        except DuplicateKeyError:
+            raise HTTPException(
+                status_code=400,
+                detail="User already exists",
+            )
         email, token = await self.generate_user_tuple_for_email(new_user)
-        send_welcome_email_task.send(user_email=email, token=token)
+        await send_via_outbox(send_welcome_email_task, user_email=email, token=token, dedupe_key=f"welcome:{email}")
         return new_user
 
     async def update_user(self, user_update: UserUpdateRequest) -> UserOut:
@@ -66,12 +83,7 @@ class UserService:
             raise HTTPException(status_code=404, detail="User not found")
 
         # Convert role names to ObjectIds
-        role_ids = []
-        for role_name in user_update.roles:
-            role = await Role.by_name(role_name)
-            if not role:
-                raise HTTPException(status_code=404, detail=f"Role '{role_name}' not found")
-            role_ids.append(role.id)
+        role_ids = [role.id for role in await Role.resolve(user_update.roles, by="name")]
 
         # Update user fields directly
         update_data = user_update.model_dump(exclude_unset=True, exclude={'roles', 'id'})
@@ -115,7 +127,9 @@ class UserService:
         if user.source == "Basic" or user.password is not None:
             await MagicLink.request_magic(identifier=user.id, _type=MagicType.recovery)
             email, token = await self.generate_user_tuple_for_email(user)
-            send_reset_password_email_task.send(user_email=email, token=token)
+            await send_via_outbox(
+                send_reset_password_email_task, user_email=email, token=token, dedupe_key=f"reset_password:{email}"
+            )
             return Message(message="Password recovery email sent")
         else:
             raise HTTPException(status_code=400, detail="User is not authenticated via password.")
@@ -173,11 +187,18 @@ class UserService:
         if user.source.lower() == "basic" or user.password is not None:
             await MagicLink.request_magic(identifier=user.id, _type=MagicType.magic)
             email, token = await self.generate_user_tuple_for_email(user)
-            send_magic_link_email_task.send(user_email=email, token=token)
+            await send_via_outbox(
+                send_magic_link_email_task, user_email=email, token=token, dedupe_key=f"magic_link:{email}"
+            )
             return Message(message="Magic link email sent")
         else:
             raise HTTPException(status_code=400, detail="User is not authenticated via password.")
 
+    async def send_bulk_email(self, request: BulkEmailRequest) -> Message:
+        """Queue one bulk email job; recipients are resolved and fanned out by the worker"""
+        message = send_bulk_email_task.send(request.selection.model_dump(mode="json"), request.template.value)
+        return Message(message=f"Bulk email queued. Message ID: {message.message_id}")
+
     async def reset_password(self, new_password: str, token_sub: str) -> Message:
         user = await User.by_email(token_sub)
         if not user:
@@ -1,14 +1,40 @@
 import asyncio
 import dramatiq
+from beanie import PydanticObjectId
 from datetime import datetime, timezone
+from typing import List
+from dramatiq.middleware import CurrentMessage
 from loguru import logger
-from app.core.dramatiq_config import broker
+from app.core.config import settings
+from app.core.dramatiq_config import broker, job_tracker, rate_limiter
+from app.core.rate_limit_middleware import RateLimit
+from app.core.worker_topology import Priority, Queues
+from app.models.auth.model import Policy
+from app.models.role.model import Role
+from app.models.util.model import EmailData, EmailTemplate
+from app.services.auth.auth_service import AuthService, SecurityService
+from app.services.email.attachment_store import get_attachment_store
 from app.services.email.email import EmailService
-from app.models.user.model import User
-from app.models.magic_link.model import MagicLink
+from app.models.user.model import User, UserSelection
+from app.models.magic_link.model import MagicLink, MagicType
 
+# Every actor that sends email shares one token bucket, sized to the SMTP provider's send rate
+EMAIL_RATE_LIMIT_KEY = "smtp"
+# Bulk sends also draw from a smaller bucket of their own, so they can never use the whole SMTP
+# rate and interactive emails always find tokens
+BULK_EMAIL_RATE_LIMIT = RateLimit.from_rate("smtp_bulk", settings.email_bulk_rate_limit)
+# Heavy Mongo maintenance actors share one cluster-wide concurrency cap
+MAINTENANCE_CONCURRENCY_KEY = "mongo_maintenance"
 
-@dramatiq.actor(max_retries=3, store_results=True)
+
+@dramatiq.actor(
+    queue_name=Queues.interactive_email,
+    priority=Priority.interactive,
+    max_retries=3,
+    store_results=True,
+    rate_limit=settings.email_rate_limit,
+    rate_limit_key=EMAIL_RATE_LIMIT_KEY,
+)
 def send_welcome_email_task(user_email: str, token: str) -> bool:
     """Background task to send welcome email"""
     email_service = EmailService()
@@ -16,7 +42,14 @@ def send_welcome_email_task(user_email: str, token: str) -> bool:
     return email_service.send_email(email_data)
 
 
-@dramatiq.actor(max_retries=3, store_results=True)
+@dramatiq.actor(
+    queue_name=Queues.interactive_email,
+    priority=Priority.interactive,
+    max_retries=3,
+    store_results=True,
+    rate_limit=settings.email_rate_limit,
+    rate_limit_key=EMAIL_RATE_LIMIT_KEY,
+)
 def send_reset_password_email_task(user_email: str, token: str) -> bool:
     """Background task to send password reset email"""
     email_service = EmailService()
@@ -24,139 +57,267 @@ def send_reset_password_email_task(user_email: str, token: str) -> bool:
     return email_service.send_email(email_data)
 
 
-@dramatiq.actor(max_retries=3, store_results=True)
+@dramatiq.actor(
+    queue_name=Queues.interactive_email,
+    priority=Priority.interactive,
+    max_retries=3,
+    store_results=True,
+    rate_limit=settings.email_rate_limit,
+    rate_limit_key=EMAIL_RATE_LIMIT_KEY,
+)
 def send_magic_link_email_task(user_email: str, token: str) -> bool:
     email_service = EmailService()
     email_data = email_service.generate_magic_link_email(user_email, token)
     return email_service.send_email(email_data)
 
-@dramatiq.actor(max_retries=2)
-def cleanup_expired_tokens():
-    """Sync task that runs async database operations"""
-    async def _cleanup_async():
-        try:
-            logger.info("Starting token cleanup task")
-
-            # Example: Clean up expired magic links
-            cutoff_time = datetime.now(timezone.utc)
-            expired_links = await MagicLink.find(
-                MagicLink.expires_at < cutoff_time
-            ).to_list()
-
-            if expired_links:
-                for link in expired_links:
-                    await link.delete()
-                logger.info(f"Cleaned up {len(expired_links)} expired magic links")
-
-            logger.info("Token cleanup completed")
-            return True
-        except Exception as e:
-            logger.error(f"Token cleanup failed: {e}")
-            raise
-
-    return asyncio.run(_cleanup_async())
-
-
-@dramatiq.actor(max_retries=1)
-def user_analytics_task(user_id: str, action: str):
-    """Sync task that runs async database operations for analytics"""
-    async def _analytics_async():
-        try:
-            logger.info(f"Processing analytics for user {user_id}: {action}")
-
-            # Example: Update user's last activity and analytics
-            user = await User.by_id(user_id)
-            if user:
-                # Update last activity timestamp
-                await user.update({
-                    "last_activity": datetime.now(timezone.utc),
-                    "activity_count": (getattr(user, 'activity_count', 0) + 1)
-                })
-                logger.info(f"Updated analytics for user {user_id}")
-            else:
-                logger.warning(f"User {user_id} not found for analytics")
-
-            logger.info(f"Analytics processed for user {user_id}")
-            return True
-        except Exception as e:
-            logger.error(f"Analytics processing failed for user {user_id}: {e}")
-            raise
-
-    return asyncio.run(_analytics_async())
-
-
-@dramatiq.actor(max_retries=3, store_results=True)
-def ensure_ri_delete_role(role_id: str) -> dict:
+@dramatiq.actor(queue_name=Queues.maintenance, priority=Priority.background, max_retries=3)
+async def delete_email_attachments_task(message_data: dict, retry_info: dict) -> int:
+    """Delete the attachments of a send_email_task that ran out of retries, so they are not orphaned"""
+    kwargs = message_data.get("kwargs", {})
+    args = message_data.get("args", [])
+    delete_attachments = kwargs.get("delete_attachments", args[1] if len(args) > 1 else True)
+    if not delete_attachments:
+        return 0
+    email = EmailData.model_validate(kwargs.get("email_data", args[0] if args else {}))
+    attachment_store = get_attachment_store()
+    for attachment in email.attachments or []:
+        await attachment_store.delete(attachment.attachment_id)
+    logger.warning(
+        f"Email to {email.to} failed after {retry_info.get('retries')} retries; "
+        f"deleted {len(email.attachments or [])} attachments"
+    )
+    return len(email.attachments or [])
+
+
+@dramatiq.actor(
+    queue_name=Queues.interactive_email,
+    priority=Priority.interactive,
+    max_retries=3,
+    store_results=True,
+    rate_limit=settings.email_rate_limit,
+    rate_limit_key=EMAIL_RATE_LIMIT_KEY,
+    on_retry_exhausted=delete_email_attachments_task.actor_name,
+)
+async def send_email_task(email_data: dict, delete_attachments: bool = True) -> bool:
+    """
+    Send a prepared email whose attachments are claim checks in the attachment store.
+
+    Only attachment ids are in the message payload; the worker streams each file from the store as
+    it builds the MIME message. Transport errors are raised so the send is retried. Attachments are
+    deleted, unless shared, once no retry will follow: after the send finishes, or by
+    delete_email_attachments_task when retries run out.
+    """
+    email = EmailData.model_validate(email_data)
+    email_service = EmailService()
+    sent = await email_service.send_email_async(email)
+    if delete_attachments:
+        for attachment in email.attachments or []:
+            await email_service.attachment_store.delete(attachment.attachment_id)
+    return sent
+
+
+# Bulk emails that also record a magic link, as the single-user recovery and magic link flows do
+BULK_EMAIL_MAGIC_TYPES = {
+    EmailTemplate.reset_password: MagicType.recovery,
+    EmailTemplate.magic_link: MagicType.magic,
+}
+
+
+@dramatiq.actor(queue_name=Queues.bulk_email, priority=Priority.bulk, max_retries=0, store_results=True)
+async def send_bulk_email_task(selection: dict, template: str) -> dict:
+    """
+    Email every user in a selection by fanning out one chunk job per bulk_email_chunk_size users.
+
+    Recipient ids are streamed from Mongo in _id order and each chunk is enqueued as soon as it is
+    read, so neither this job nor its message holds the whole recipient list. Chunk jobs add their
+    sent and failed counts to this job's progress, readable at /dramatiq/jobs/{message_id}/progress.
+    Not retried: a partial fan-out would be re-sent from the start.
+    """
+    message = CurrentMessage.get_current_message()
+    query = UserSelection.model_validate(selection).to_query()
+
+    total = await User.find(query).count()
+    # Set the total before any chunk can report, so the percentage is never computed without it.
+    # The tracker and broker clients are synchronous; keep their Redis calls off the shared event loop
+    await asyncio.to_thread(job_tracker.report_progress, message.message_id, processed=0, total=total)
+
+    chunks = 0
+    async for ids in User.iter_id_chunks(query, settings.bulk_email_chunk_size):
+        await asyncio.to_thread(send_email_chunk_task.send, message.message_id, [str(_id) for _id in ids], template)
+        chunks += 1
+
+    logger.info(f"Bulk {template} email fanned out to {total} users in {chunks} chunks")
+    return {"recipients": total, "chunks": chunks}
+
+
+@dramatiq.actor(queue_name=Queues.bulk_email, priority=Priority.bulk, max_retries=3)
+def fail_email_chunk_task(message_data: dict, retry_info: dict) -> int:
+    """Count the users of a chunk that ran out of retries as failed, so the bulk job's progress still completes"""
+    kwargs = message_data.get("kwargs", {})
+    args = message_data.get("args", [])
+    bulk_message_id = kwargs.get("bulk_message_id", args[0] if args else None)
+    user_ids = kwargs.get("user_ids", args[1] if len(args) > 1 else [])
+    job_tracker.increment_progress(bulk_message_id, processed=len(user_ids), failed=len(user_ids))
+    logger.warning(
+        f"Bulk email chunk for {bulk_message_id} failed after {retry_info.get('retries')} retries; "
+        f"counted {len(user_ids)} users as failed"
+    )
+    return len(user_ids)
+
+
+@dramatiq.actor(
+    queue_name=Queues.bulk_email,
+    priority=Priority.bulk,
+    max_retries=3,
+    on_retry_exhausted=fail_email_chunk_task.actor_name,
+)
+async def send_email_chunk_task(bulk_message_id: str, user_ids: List[str], template: str) -> dict:
+    """
+    Send one chunk of a bulk email concurrently over the shared async SMTP connections.
+
+    Failed sends are counted rather than raised, so a retry never re-sends the emails of a chunk
+    that already went out; only failures before sending (loading users) are retried. A chunk that
+    runs out of retries is counted as failed by fail_email_chunk_task.
+    """
+    email_template = EmailTemplate(template)
+    users = await User.by_ids(user_ids)
+    roles = {role.id: role for role in await Role.by_ids(list({_id for user in users for _id in user.roles}))}
+
+    if users and email_template in BULK_EMAIL_MAGIC_TYPES:
+        await MagicLink.insert_many([
+            MagicLink.generate_magic_link(user.id, BULK_EMAIL_MAGIC_TYPES[email_template], True) for user in users
+        ])
+
+    auth_service = AuthService(SecurityService(password_policy=Policy()))
+    email_service = EmailService()
+    # A chunk sends many emails from one message, so each send takes its own token from the shared bucket;
+    # the lock keeps a single coroutine at a time polling Redis for tokens
+    email_rate_limit = rate_limiter.limit_for(send_email_task.actor_name)
+    throttle_lock = asyncio.Lock()
+
+    async def _send(user: User) -> bool:
+        scopes, role_names = User.scopes_and_roles_from([roles[_id] for _id in user.roles if _id in roles])
+        token, _ = auth_service.create_access_token(subject=user.email, scopes=scopes, roles=role_names)
+        async with throttle_lock:
+            await rate_limiter.throttle(BULK_EMAIL_RATE_LIMIT)
+            await rate_limiter.throttle(email_rate_limit)
+        return await email_service.send_email_async(email_service.generate_email(email_template, user.email, token))
+
+    results = await asyncio.gather(*(_send(user) for user in users), return_exceptions=True)
+    sent = sum(1 for result in results if result is True)
+    # Users deleted since the fan-out count as failed so the bulk job's progress still reaches its total
+    failed = len(user_ids) - sent
+
+    await asyncio.to_thread(job_tracker.increment_progress, bulk_message_id, processed=len(user_ids), failed=failed)
+    logger.info(f"Bulk email chunk for {bulk_message_id}: {sent} sent, {failed} failed")
+    return {"sent": sent, "failed": failed}
+
+
+@dramatiq.actor(
+    queue_name=Queues.maintenance,
+    priority=Priority.background,
+    max_retries=2,
+    max_concurrency=settings.maintenance_max_concurrency,
+    concurrency_key=MAINTENANCE_CONCURRENCY_KEY,
+)
+async def cleanup_expired_tokens():
+    """Delete expired magic links on the worker's shared event loop"""
+    try:
+        logger.info("Starting token cleanup task")
+
+        cutoff_time = datetime.now(timezone.utc)
+        result = await MagicLink.find(MagicLink.expires_at < cutoff_time).delete()
+        deleted = result.deleted_count if result else 0
+        if deleted:
+            logger.info(f"Cleaned up {deleted} expired magic links")
+
+        logger.info("Token cleanup completed")
+        return True
+    except Exception as e:
+        logger.error(f"Token cleanup failed: {e}")
+        raise
+
+
+@dramatiq.actor(queue_name=Queues.analytics, priority=Priority.background, max_retries=1)
+async def user_analytics_task(user_id: str, action: str):
+    """Record user activity on the worker's shared event loop"""
+    try:
+        logger.info(f"Processing analytics for user {user_id}: {action}")
+
+        user = await User.by_id(user_id)
+        if user:
+            # Update last activity timestamp and count in one atomic write
+            await user.update({
+                "$set": {"last_activity": datetime.now(timezone.utc)},
+                "$inc": {"activity_count": 1},
+            })
+            logger.info(f"Updated analytics for user {user_id}")
+        else:
+            logger.warning(f"User {user_id} not found for analytics")
+
+        logger.info(f"Analytics processed for user {user_id}")
+        return True
+    except Exception as e:
+        logger.error(f"Analytics processing failed for user {user_id}: {e}")
+        raise
+
+
+@dramatiq.actor(
+    queue_name=Queues.maintenance,
+    priority=Priority.background,
+    max_retries=3,
+    store_results=True,
+    max_concurrency=settings.maintenance_max_concurrency,
+    concurrency_key=MAINTENANCE_CONCURRENCY_KEY,
+)
+async def ensure_ri_delete_role(role_id: str) -> dict:
     """
     Remove a role from all users who have it (referential integrity cleanup)
-    This is a Dramatiq task that runs async database operations.
+    This is an async Dramatiq task that runs on the worker's shared event loop.
+
+    Users are updated with chunked update_many $pull writes rather than one save per user.
+    Users already cleaned up no longer match {"roles": role_id}, so a retried or redelivered
+    message resumes where the previous run stopped. Progress is reported to the job tracker
+    after every chunk.
 
     Note: This task is resilient to the role already being deleted,
     as it focuses on cleaning up user references.
     """
-    async def _cleanup_role_references():
-        try:
-            logger.info(f"Starting referential integrity cleanup for role: {role_id}")
-
-            # Find users who have this role (even if role is already deleted)
-            users_with_role = await User.has_role(role_id)
-            updated_users = []
-            failed_updates = []
-
-            if not users_with_role:
-                logger.info(f"No users found with role {role_id}, cleanup complete")
-                return {
-                    "role_id": role_id,
-                    "users_updated": 0,
-                    "updated_user_ids": [],
-                    "failed_updates": [],
-                    "success": True
-                }
-
-            for user in users_with_role:
-                try:
-                    if user and hasattr(user, 'roles'):
-                        original_role_count = len(user.roles)
-                        filtered_roles = [role for role in user.roles if str(role) != str(role_id)]
-
-                        if len(filtered_roles) != original_role_count:
-                            user.roles = filtered_roles
-                            await user.save()
-                            updated_users.append(user.id)
-                            logger.info(f"Removed role {role_id} from user {user.email}")
-                        else:
-                            logger.debug(f"User {user.email} did not have role {role_id}")
-                except Exception as user_error:
-                    logger.error(f"Failed to update user {getattr(user, 'email', 'unknown')}: {user_error}")
-                    failed_updates.append({
-                        "user_id": str(getattr(user, 'id', 'unknown')),
-                        "error": str(user_error)
-                    })
-
-            result = {
-                "role_id": role_id,
-                "users_updated": len(updated_users),
-                "updated_user_ids": [str(uid) for uid in updated_users],
-                "failed_updates": failed_updates,
-                "success": len(failed_updates) == 0
-            }
+    message = CurrentMessage.get_current_message()
 
-            if failed_updates:
-                logger.warning(f"Referential integrity cleanup completed with {len(failed_updates)} failures. Updated {len(updated_users)} users.")
-            else:
-                logger.info(f"Referential integrity cleanup completed successfully. Updated {len(updated_users)} users.")
+    async def _report_progress(matched: int, total: int):
+        # The tracker's Redis client is synchronous; keep its writes off the shared event loop
+        if message:
+            await asyncio.to_thread(job_tracker.report_progress, message.message_id, processed=matched, total=total)
 
-            return result
+    try:
+        logger.info(f"Starting referential integrity cleanup for role: {role_id}")
 
-        except Exception as e:
-            logger.error(f"Referential integrity cleanup failed for role {role_id}: {e}")
+        role_oid = PydanticObjectId(role_id)
+        query = {"roles": role_oid}
+        total = await User.find(query).count()
+        if not total:
+            logger.info(f"No users found with role {role_id}, cleanup complete")
             return {
                 "role_id": role_id,
                 "users_updated": 0,
-                "updated_user_ids": [],
-                "failed_updates": [],
-                "success": False,
-                "error": str(e)
+                "success": True
             }
 
-    return asyncio.run(_cleanup_role_references())
\ No newline at end of file
+        await _report_progress(0, total)
+        matched, modified = await User.update_in_chunks(
+            query,
+            {"$pull": {"roles": role_oid}},
+            chunk_size=settings.bulk_update_chunk_size,
+            on_chunk=lambda chunk_matched, _: _report_progress(chunk_matched, total),
+        )
+        logger.info(f"Referential integrity cleanup completed successfully. Updated {modified} users.")
+        return {
+            "role_id": role_id,
+            "users_updated": modified,
+            "success": True
+        }
+    except Exception as e:
+        # Re-raise so Retries redelivers the message; the next attempt picks up the remaining users
+        logger.error(f"Referential integrity cleanup failed for role {role_id}: {e}")
+        raise
@@ -1,11 +1,14 @@
 from typing import TypeVar
 from fastapi import HTTPException, Depends
 from app.core.security.api import  reusable_oauth
+from app.db.redis_manager import redis_manager
 from app.models.auth.model import Token, Policy, RefreshTokenReq
 from app.models.role.model import Role
 from app.models.user.model import User
 from app.services.auth.auth_service import SecurityService, AuthService
+from app.services.dramatiq.dashboard_service import DashboardSnapshotService, dashboard_snapshot_service
 from app.services.dramatiq.dramatiq_service import DramatiqService
+from app.services.dramatiq.event_hub import JobEventHub, job_event_hub
 from app.services.email.email import EmailService
 from app.services.role.role_service import RoleService
 from app.services.user.user_service import UserService, MyUserService
@@ -29,7 +32,15 @@ def get_auth_service(security_service=Depends(get_security_service)) -> AuthServ
     return AuthService(security_service)
 
 def get_dramatiq_service() -> DramatiqService:
-    return DramatiqService()
+    if not redis_manager.is_connected:
+        raise HTTPException(status_code=503, detail="Redis connection not available")
+    return DramatiqService(redis_manager.client)
+
+def get_dashboard_snapshot_service() -> DashboardSnapshotService:
+    return dashboard_snapshot_service
+
+def get_job_event_hub() -> JobEventHub:
+    return job_event_hub
 
 def get_user_service(
         email_service: EmailService = Depends(get_email_service),
@@ -10,14 +10,19 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.db.db_manager import db_manager
+from app.db.redis_manager import redis_manager
 from app.api.v1.dramatiq.endpoints import dramatiq_router
+from app.services.dramatiq.event_hub import job_event_hub
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for the Dramatiq monitoring server"""
     await db_manager.connect()
+    await redis_manager.connect()
     yield
+    await job_event_hub.stop()
+    await redis_manager.disconnect()
     await db_manager.disconnect()
 
 
@@ -0,0 +1,64 @@
+"""
+Start Dramatiq workers following the worker topology.
+
+Each pool in the topology runs as its own dramatiq process group consuming only its queues, so
+interactive emails are never stuck behind bulk or maintenance work.
+
+    python run_workers.py                      # every pool
+    python run_workers.py --pool interactive   # one pool, e.g. one container per pool
+    python run_workers.py --watch app          # reload on code changes (development)
+"""
+import argparse
+import signal
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+from app.core.worker_topology import get_pool, get_topology, uncovered_queues, worker_command
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start Dramatiq worker pools from the worker topology")
+    parser.add_argument("--pool", action="append", help="Pool to start; repeat for several (default: all pools)")
+    parser.add_argument("--watch", help="Directory to watch for code changes")
+    args = parser.parse_args()
+
+    topology = get_topology()
+    pools = [get_pool(name, topology) for name in args.pool] if args.pool else topology
+
+    # Importing the actors declares their queues on the broker
+    from app.core.dramatiq_config import broker
+    import app.tasks.background_tasks  # noqa: F401
+    missing = uncovered_queues(broker.get_declared_queues(), topology)
+    if missing:
+        logger.warning(f"No worker pool consumes queues {sorted(missing)}; their messages will not run")
+
+    processes = []
+    for pool in pools:
+        logger.info(f"Starting worker pool {pool.name}: queues={pool.queues} processes={pool.processes} threads={pool.threads}")
+        processes.append(subprocess.Popen(worker_command(pool, watch=args.watch)))
+
+    def stop(exit_code: int):
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        for process in processes:
+            process.wait()
+        sys.exit(exit_code)
+
+    signal.signal(signal.SIGINT, lambda signum, frame: stop(0))
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop(0))
+
+    # A pool that exits takes the others down, so the container or supervisor restarts the whole set
+    while True:
+        for pool, process in zip(pools, processes):
+            if process.poll() is not None:
+                logger.error(f"Worker pool {pool.name} exited with code {process.returncode}")
+                stop(1)
+        time.sleep(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,13 +12,8 @@ import time
 def start_dramatiq_worker():
     """Start the Dramatiq worker process"""
     try:
-        # Adjust this command based on your actual dramatiq setup
-        subprocess.run([
-            sys.executable, "-m", "dramatiq",
-            "app.tasks.background_tasks",  # Adjust path as needed
-            "--threads", "4",
-            "--processes", "1"
-        ])
+        # Starts one dramatiq process group per pool in the worker topology
+        subprocess.run([sys.executable, "run_workers.py"])
     except KeyboardInterrupt:
         print("Dramatiq worker stopped")
 
@@ -0,0 +1,57 @@
+import asyncio
+
+import dramatiq
+import fakeredis
+import pytest
+from dramatiq.brokers.redis import RedisBroker
+from dramatiq.middleware import Prometheus, default_middleware
+
+from app.core.config import settings
+from app.core.job_tracker_middleware import JobTrackerMiddleware
+from app.services.dramatiq.dramatiq_service import DramatiqService
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_broker(redis_server):
+    """A real RedisBroker, so tests see the key layout its dispatch script writes"""
+    broker = RedisBroker(
+        client=fakeredis.FakeRedis(server=redis_server),
+        namespace=settings.dramatiq_namespace,
+        # Prometheus would start its exposition server when a test boots a worker
+        middleware=[middleware() for middleware in default_middleware if middleware is not Prometheus],
+    )
+    job_tracker = JobTrackerMiddleware(redis_url="redis://localhost", namespace=settings.dramatiq_namespace)
+    job_tracker.redis_client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+    broker.add_middleware(job_tracker)
+    previous = dramatiq.get_broker()
+    dramatiq.set_broker(broker)
+    yield broker
+    dramatiq.set_broker(previous)
+
+
+@pytest.fixture
+def add_redis_middleware(redis_broker, redis_server):
+    """Install a middleware that keeps its own Redis client and Lua script, ahead of the job tracker as in production"""
+    def add(middleware_class, **options):
+        middleware = middleware_class(redis_url="redis://localhost", namespace=settings.dramatiq_namespace, **options)
+        middleware.redis_client = fakeredis.FakeRedis(server=redis_server, decode_responses=True)
+        middleware._script = middleware.redis_client.register_script(middleware._script.script)
+        redis_broker.add_middleware(middleware, before=JobTrackerMiddleware)
+        return middleware
+
+    return add
+
+
+@pytest.fixture
+def dramatiq_service(redis_server):
+    return DramatiqService(fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True))
+
+
+@pytest.fixture
+def run():
+    return asyncio.run
@@ -0,0 +1,16 @@
+from app.core.job_tracker_middleware import JobTrackerMiddleware
+from app.tasks import background_tasks
+from app.tasks.background_tasks import fail_email_chunk_task, send_email_chunk_task
+
+
+def test_exhausted_chunk_counts_its_users_as_failed(redis_broker, dramatiq_service, monkeypatch, run):
+    job_tracker = next(middleware for middleware in redis_broker.middleware if isinstance(middleware, JobTrackerMiddleware))
+    monkeypatch.setattr(background_tasks, "job_tracker", job_tracker)
+    job_tracker.report_progress("bulk-job", processed=0, total=3)
+
+    chunk = send_email_chunk_task.message("bulk-job", ["u1", "u2", "u3"], "welcome")
+    assert fail_email_chunk_task.fn(chunk.asdict(), {"retries": 3}) == 3
+
+    progress = run(dramatiq_service.get_job_progress("bulk-job"))
+    assert (progress["processed"], progress["percent"]) == (3, 100.0)
+    assert job_tracker.redis_client.hget(job_tracker.keys.progress("bulk-job"), "failed") == "3"
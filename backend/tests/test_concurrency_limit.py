@@ -0,0 +1,63 @@
+import dramatiq
+import pytest
+from dramatiq import Message
+from dramatiq.common import dq_name
+from dramatiq.middleware import SkipMessage
+
+from app.core.concurrency_limit_middleware import ConcurrencyLimitMiddleware
+from app.core.rate_limit_middleware import RateLimitMiddleware
+
+
+def semaphore_holders(middleware, concurrency_key):
+    return middleware.redis_client.zrange(middleware.keys.semaphore(concurrency_key), 0, -1)
+
+
+def test_full_semaphore_defers_until_a_slot_is_released(redis_broker, add_redis_middleware):
+    concurrency_limiter = add_redis_middleware(ConcurrencyLimitMiddleware, min_backoff_ms=100)
+
+    @dramatiq.actor(broker=redis_broker, queue_name="concurrency_test", max_concurrency=1, concurrency_key="slot_test")
+    def limited_task():
+        pass
+
+    running = limited_task.message()
+    redis_broker.emit_before("process_message", running)
+    waiting = limited_task.message()
+    with pytest.raises(SkipMessage):
+        redis_broker.emit_before("process_message", waiting)
+
+    [deferred] = [
+        Message.decode(data)
+        for data in redis_broker.client.hvals(f"{redis_broker.namespace}:{dq_name('concurrency_test')}.msgs")
+    ]
+    assert (deferred.message_id, deferred.options["deferred_by"]) == (waiting.message_id, "concurrency_limit:slot_test")
+    assert semaphore_holders(concurrency_limiter, "slot_test") == [running.message_id]
+
+    redis_broker.emit_after("process_message", running, result=None)
+    assert semaphore_holders(concurrency_limiter, "slot_test") == []
+
+
+def test_slot_is_released_when_the_rate_limiter_defers(redis_broker, add_redis_middleware):
+    # Same order as production: the slot is taken before the token
+    concurrency_limiter = add_redis_middleware(ConcurrencyLimitMiddleware)
+    add_redis_middleware(RateLimitMiddleware, max_inline_wait_ms=0)
+
+    @dramatiq.actor(
+        broker=redis_broker, queue_name="concurrency_test", max_concurrency=1, concurrency_key="skip_test",
+        rate_limit="1/m", rate_limit_key="skip_test",
+    )
+    def limited_task():
+        pass
+
+    first = limited_task.message()
+    redis_broker.emit_before("process_message", first)
+    redis_broker.emit_after("process_message", first, result=None)
+
+    # The slot is free again but the bucket is empty, so the rate limiter skips after the slot was taken
+    message = limited_task.message()
+    with pytest.raises(SkipMessage, match="rate_limit:skip_test"):
+        redis_broker.emit_before("process_message", message)
+    assert semaphore_holders(concurrency_limiter, "skip_test") == [message.message_id]
+
+    # What the worker does with a skipped message
+    redis_broker.emit_after("skip_message", message)
+    assert semaphore_holders(concurrency_limiter, "skip_test") == []
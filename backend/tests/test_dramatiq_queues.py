@@ -0,0 +1,70 @@
+import dramatiq
+
+
+def declare_actor(broker, queue_name):
+    @dramatiq.actor(broker=broker, queue_name=queue_name)
+    def queued_task(value):
+        pass
+
+    return queued_task
+
+
+def test_queue_keys_match_redis_broker_layout(redis_broker, dramatiq_service, run):
+    actor = declare_actor(redis_broker, "layout_test")
+    messages = [actor.send(i) for i in range(3)]
+
+    stats = run(dramatiq_service.get_queue_stats("layout_test"))
+    assert stats["pending_jobs"] == 3
+
+    jobs = run(dramatiq_service.get_all_jobs("layout_test"))
+    assert {job.message_id for job in jobs} >= {message.message_id for message in messages}
+
+
+def test_reconcile_finds_queues_from_message_hashes(redis_broker, dramatiq_service, run):
+    declare_actor(redis_broker, "reconcile_test").send_with_options(args=(1,), delay=60_000)
+
+    queues = run(dramatiq_service.reconcile_queues())
+    # The delayed message sits in reconcile_test.DQ; the registry holds its canonical queue
+    assert "reconcile_test" in queues
+    assert not any(queue.endswith((".DQ", ".XQ")) for queue in queues)
+
+
+def test_cancel_unknown_job_is_rejected(redis_broker, dramatiq_service, run):
+    declare_actor(redis_broker, "cancel_test")
+
+    assert run(dramatiq_service.cancel_job("not-a-job")) is False
+    assert run(dramatiq_service._get_redis_client().zcard(dramatiq_service.keys.cancelled_set())) == 0
+
+
+def test_cancel_removes_message_from_queue(redis_broker, dramatiq_service, run):
+    actor = declare_actor(redis_broker, "cancel_test")
+    kept, cancelled = actor.send(1), actor.send(2)
+
+    assert run(dramatiq_service.cancel_job(cancelled.message_id, remove_from_queue=True, queue_name="cancel_test"))
+
+    jobs = run(dramatiq_service.get_all_jobs("cancel_test"))
+    pending_ids = {job.message_id for job in jobs if job.status == "pending"}
+    assert kept.message_id in pending_ids
+    assert cancelled.message_id not in pending_ids
+
+
+def test_clear_queue_deletes_broker_keys(redis_broker, dramatiq_service, run):
+    actor = declare_actor(redis_broker, "clear_test")
+    actor.send(1)
+    actor.send_with_options(args=(2,), delay=60_000)
+
+    assert run(dramatiq_service.clear_queue("clear_test")) == 2
+    assert run(dramatiq_service.get_queue_stats("clear_test"))["pending_jobs"] == 0
+
+
+def test_retry_failed_job_enqueues_through_broker(redis_broker, dramatiq_service, run):
+    declare_actor(redis_broker, "retry_test")
+    job_key = dramatiq_service.keys.job("failed-job")
+    run(dramatiq_service._get_redis_client().hset(job_key, mapping={
+        "message_id": "failed-job", "actor_name": "queued_task", "queue_name": "retry_test",
+        "args": "[1]", "kwargs": "{}", "status": "failed",
+    }))
+
+    assert run(dramatiq_service.retry_failed_job("failed-job"))
+    jobs = run(dramatiq_service.get_all_jobs("retry_test"))
+    assert [job.args for job in jobs if job.message_id == "failed-job"] == [[1]]
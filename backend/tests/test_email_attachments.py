@@ -0,0 +1,57 @@
+import os
+from email import message_from_bytes
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.models.util.model import EmailData
+from app.services.email.attachment_store import LocalAttachmentStore
+from app.services.email.email import EmailService
+from app.tasks.background_tasks import delete_email_attachments_task
+
+
+@pytest.fixture
+def attachment_store(tmp_path):
+    return LocalAttachmentStore(str(tmp_path), chunk_size=1000)
+
+
+def test_attachments_are_encoded_as_they_stream(attachment_store, run):
+    data = os.urandom(10_000)
+    attachment = run(attachment_store.attach("report.pdf", data))
+    email = EmailData(to="user@example.com", subject="Report", html_content="<p>hi</p>", attachments=[attachment])
+
+    message = message_from_bytes(run(EmailService(attachment_store)._build_message_async(email)))
+    html_part, part = message.get_payload()
+
+    assert part.get_content_type() == "application/pdf"
+    assert part.get_filename() == "report.pdf"
+    assert part.get_payload(decode=True) == data
+    assert max(len(line) for line in part.get_payload().splitlines()) == 76
+    assert html_part.is_multipart() and not message.defects
+
+
+def test_oversized_attachments_are_not_sent(attachment_store, monkeypatch, run):
+    monkeypatch.setattr(settings, "emails_enabled", True)
+    monkeypatch.setattr(settings, "email_attachment_max_bytes", 15_000)
+    attachments = [run(attachment_store.attach(f"part{i}.bin", os.urandom(10_000))) for i in range(2)]
+    email = EmailData(to="user@example.com", subject="Report", html_content="<p>hi</p>", attachments=attachments)
+
+    # Neither attachment is over the limit alone, but together they are; a permanent failure, not retried
+    assert run(EmailService(attachment_store).send_email_async(email)) is False
+
+    with pytest.raises(HTTPException) as error:
+        run(attachment_store.attach("big.bin", os.urandom(15_001)))
+    assert error.value.status_code == 413
+
+
+def test_exhausted_send_deletes_its_attachments(attachment_store, monkeypatch, run):
+    monkeypatch.setattr("app.tasks.background_tasks.get_attachment_store", lambda: attachment_store)
+    attachment = run(attachment_store.attach("report.pdf", b"report"))
+    email = EmailData(to="user@example.com", subject="Report", html_content="<p>hi</p>", attachments=[attachment])
+
+    message_data = {"args": [email.model_dump()], "kwargs": {}}
+    assert run(delete_email_attachments_task.fn.__wrapped__(message_data, {"retries": 3})) == 1
+
+    with pytest.raises(HTTPException):
+        run(anext(attachment_store.stream(attachment.attachment_id)))
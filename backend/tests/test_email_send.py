@@ -0,0 +1,124 @@
+import smtplib
+
+import aiosmtplib
+import pytest
+
+from app.core.config import settings
+from app.models.util.model import EmailData
+from app.services.email import email as email_module
+from app.services.email.async_smtp import AsyncSMTPTransport
+from app.services.email.email import EmailService
+from app.services.email.smtp_pool import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """smtplib.SMTP stand-in that records what was sent and can fail at login"""
+    instances = []
+
+    def __init__(self, *args, fail_login=False, **kwargs):
+        self.fail_login = fail_login
+        self.sent = []
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self, **kwargs):
+        pass
+
+    def login(self, user, password):
+        if self.fail_login:
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+
+    def sendmail(self, from_addr, to_addrs, message):
+        if "refused@example.com" in to_addrs:
+            raise smtplib.SMTPRecipientsRefused({"refused@example.com": (550, b"no such user")})
+        self.sent.append(to_addrs)
+        return {}
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def smtp_pool(monkeypatch):
+    FakeSMTP.instances = []
+    monkeypatch.setattr(settings, "emails_enabled", True)
+    monkeypatch.setattr(smtplib, "SMTP", FakeSMTP)
+    pool = SMTPConnectionPool()
+    monkeypatch.setattr(email_module, "smtp_pool", pool)
+    return pool
+
+
+def make_email(to):
+    return EmailData(to=to, subject="Hello", html_content="<p>hi</p>")
+
+
+def test_list_recipients_are_sent_as_a_flat_list(smtp_pool):
+    assert EmailService().send_email(make_email(["a@example.com", "b@example.com"])) is True
+    assert FakeSMTP.instances[0].sent == [["a@example.com", "b@example.com"]]
+
+
+def test_refused_recipient_is_not_resent(smtp_pool):
+    assert EmailService().send_email(make_email("refused@example.com")) is False
+    # The connection is kept, not discarded and retried as if it had dropped
+    assert len(FakeSMTP.instances) == 1 and not FakeSMTP.instances[0].closed
+
+
+def test_failed_login_closes_the_connection(smtp_pool, monkeypatch):
+    monkeypatch.setattr(smtplib, "SMTP", lambda *args, **kwargs: FakeSMTP(fail_login=True))
+
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        smtp_pool._connect()
+    assert FakeSMTP.instances[0].closed
+
+
+class FakeAsyncSMTP:
+    """aiosmtplib.SMTP stand-in mirroring FakeSMTP"""
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.sent = []
+        self.is_connected = False
+        FakeAsyncSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, user, password):
+        pass
+
+    async def sendmail(self, from_addr, to_addrs, message):
+        if "refused@example.com" in to_addrs:
+            raise aiosmtplib.SMTPRecipientsRefused([
+                aiosmtplib.SMTPRecipientRefused(550, "no such user", "refused@example.com")
+            ])
+        self.sent.append(to_addrs)
+        return {}, "OK"
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+@pytest.fixture
+def async_smtp_transport(monkeypatch):
+    FakeAsyncSMTP.instances = []
+    monkeypatch.setattr(settings, "emails_enabled", True)
+    monkeypatch.setattr(aiosmtplib, "SMTP", FakeAsyncSMTP)
+    transport = AsyncSMTPTransport()
+    monkeypatch.setattr(email_module, "async_smtp_transport", transport)
+    return transport
+
+
+def test_async_list_recipients_are_sent_as_a_flat_list(async_smtp_transport, run):
+    assert run(EmailService().send_email_async(make_email(["a@example.com", "b@example.com"]))) is True
+    assert FakeAsyncSMTP.instances[0].sent == [["a@example.com", "b@example.com"]]
+
+
+def test_async_refused_recipient_returns_false(async_smtp_transport, run):
+    assert run(EmailService().send_email_async(make_email("refused@example.com"))) is False
+    assert len(FakeAsyncSMTP.instances) == 1
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from app.services.dramatiq.event_hub import JobEventHub
+
+
+class FlakyRedis:
+    """Redis client whose first pubsub fails, as when the connection drops"""
+
+    def __init__(self, redis_client):
+        self.redis_client = redis_client
+        self.pubsub_calls = 0
+
+    def pubsub(self, **kwargs):
+        self.pubsub_calls += 1
+        if self.pubsub_calls == 1:
+            raise ConnectionError("connection lost")
+        return self.redis_client.pubsub(**kwargs)
+
+
+def test_hub_resubscribes_after_redis_error(redis_server, run):
+    async def scenario():
+        redis_client = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+        flaky_client = FlakyRedis(redis_client)
+        hub = JobEventHub("hub_test", min_backoff_seconds=0.01)
+        subscriber = hub.subscribe(flaky_client)
+        stream = hub.stream(subscriber, heartbeat_seconds=0.05)
+        try:
+            assert (await anext(stream)).startswith("event: interrupted")
+
+            event = {"message_id": "job-1", "queue_name": "default", "actor_name": "task", "status": "completed"}
+            while not await redis_client.publish(hub.channel, json.dumps(event)):
+                await asyncio.sleep(0.01)
+            chunk = await anext(stream)
+            while chunk.startswith(":"):
+                chunk = await anext(stream)
+            assert chunk.startswith("event: job\nid: job-1")
+            assert flaky_client.pubsub_calls == 2
+        finally:
+            await stream.aclose()
+            await hub.unsubscribe(subscriber)
+            await redis_client.aclose()
+
+    run(scenario())
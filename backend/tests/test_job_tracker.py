@@ -0,0 +1,132 @@
+import json
+import time
+from datetime import datetime, timedelta, UTC
+
+import dramatiq
+from dramatiq import Worker
+
+from app.core.job_keys import JobKeys, latency_bucket
+from app.core.job_tracker_middleware import JobTrackerMiddleware
+
+
+def get_job_tracker(broker) -> JobTrackerMiddleware:
+    return next(middleware for middleware in broker.middleware if isinstance(middleware, JobTrackerMiddleware))
+
+
+def declare_failing_actor(broker, **options):
+    @dramatiq.actor(broker=broker, queue_name="tracker_test", **options)
+    def failing_task():
+        raise ValueError("boom")
+
+    return failing_task
+
+
+def test_enqueue_records_max_retries_from_retries_middleware(redis_broker, dramatiq_service, run):
+    message = declare_failing_actor(redis_broker).send()
+
+    job = run(dramatiq_service.get_job_by_id(message.message_id))
+    assert job.max_retries == 20
+
+
+def test_failed_attempt_is_retrying_until_retries_are_exhausted(redis_broker, dramatiq_service, run):
+    actor = declare_failing_actor(redis_broker, max_retries=1)
+    job_tracker = get_job_tracker(redis_broker)
+
+    message = actor.message()
+    job_tracker.after_process_message(redis_broker, message, exception=ValueError("boom"))
+    assert run(dramatiq_service.get_job_by_id(message.message_id)).status == "retrying"
+
+    message = actor.message_with_options(retries=1)
+    job_tracker.after_process_message(redis_broker, message, exception=ValueError("boom"))
+    job = run(dramatiq_service.get_job_by_id(message.message_id))
+    assert job.status == "failed"
+    assert job.failed_at is not None
+
+
+def test_throws_fails_on_first_attempt(redis_broker, dramatiq_service, run):
+    actor = declare_failing_actor(redis_broker, throws=(ValueError,))
+    message = actor.message()
+
+    get_job_tracker(redis_broker).after_process_message(redis_broker, message, exception=ValueError("boom"))
+    assert run(dramatiq_service.get_job_by_id(message.message_id)).status == "failed"
+
+
+def test_legacy_json_records_are_readable_and_migrated(redis_broker, dramatiq_service, run):
+    job_tracker = get_job_tracker(redis_broker)
+    job_key = job_tracker.keys.job("legacy-job")
+    job_tracker.redis_client.setex(job_key, 3600, json.dumps({
+        "message_id": "legacy-job",
+        "actor_name": "failing_task",
+        "queue_name": "tracker_test",
+        "args": [1],
+        "kwargs": {},
+        "status": "completed",
+        "result": {"sent": True},
+    }))
+
+    assert run(dramatiq_service.get_job_by_id("legacy-job")).status == "completed"
+    assert run(dramatiq_service.cancel_job("legacy-job")) is False
+
+    assert job_tracker.migrate_legacy_records() == 1
+    assert job_tracker.redis_client.type(job_key) == "hash"
+    assert 0 < job_tracker.redis_client.ttl(job_key) <= 3600
+    job = run(dramatiq_service.get_job_by_id("legacy-job"))
+    assert (job.status, job.args, job.result) == ("completed", [1], {"sent": True})
+    assert job_tracker.migrate_legacy_records() == 0
+
+
+def run_worker_until(broker, condition, timeout=10.0):
+    """Run a real worker until condition() holds"""
+    worker = Worker(broker, worker_timeout=50, worker_threads=1)
+    worker.start()
+    try:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "worker did not finish in time"
+            time.sleep(0.02)
+    finally:
+        worker.stop()
+
+
+def test_delayed_message_is_counted_once(redis_broker, dramatiq_service, run):
+    @dramatiq.actor(broker=redis_broker, queue_name="tracker_delay_test")
+    def delayed_task():
+        pass
+
+    message = delayed_task.send_with_options(delay=100)
+    job_tracker = get_job_tracker(redis_broker)
+    job_key = job_tracker.keys.job(message.message_id)
+    run_worker_until(redis_broker, lambda: job_tracker.redis_client.hget(job_key, "status") == "completed")
+
+    stats = job_tracker.redis_client.hgetall(job_tracker.keys.queue_stats("tracker_delay_test"))
+    assert (stats["enqueued"], stats["completed"], stats["running"]) == ("1", "1", "0")
+
+
+def test_failure_before_start_leaves_running_gauge_alone(redis_broker):
+    message = declare_failing_actor(redis_broker).message()
+    job_tracker = get_job_tracker(redis_broker)
+
+    # Another middleware's before_process_message raised, so this one never saw the message start
+    job_tracker.after_process_message(redis_broker, message, exception=ValueError("boom"))
+    stats = job_tracker.redis_client.hgetall(job_tracker.keys.queue_stats("tracker_test"))
+    assert stats.get("running", "0") == "0"
+
+
+def test_delayed_message_waits_from_when_it_is_due(redis_broker):
+    @dramatiq.actor(broker=redis_broker, queue_name="tracker_wait_test")
+    def delayed_task():
+        pass
+
+    delay_ms = 1000
+    message = delayed_task.send_with_options(delay=delay_ms)
+    job_tracker = get_job_tracker(redis_broker)
+    job_key = job_tracker.keys.job(message.message_id)
+    run_worker_until(redis_broker, lambda: job_tracker.redis_client.hget(job_key, "status") == "completed")
+
+    now = datetime.now(UTC)
+    histogram = {}
+    for at in (now - timedelta(minutes=1), now):
+        histogram.update(job_tracker.redis_client.hgetall(job_tracker.keys.latency("wait", JobKeys.bucket("minute", at))))
+    wait_buckets = [int(field.rsplit(":", 1)[1]) for field in histogram if field.startswith("tracker_wait_test:")]
+    # Measured from when the worker moved it to its queue, not from the send
+    assert wait_buckets and max(wait_buckets) < latency_bucket(delay_ms)
@@ -0,0 +1,55 @@
+import dramatiq
+import pytest
+from dramatiq import Message
+from dramatiq.common import dq_name
+from dramatiq.middleware import SkipMessage
+
+from app.core.rate_limit_middleware import RateLimit, RateLimitMiddleware
+
+
+def delayed_messages(broker, queue_name):
+    return [Message.decode(data) for data in broker.client.hvals(f"{broker.namespace}:{dq_name(queue_name)}.msgs")]
+
+
+def test_bucket_allows_a_burst_then_reports_the_wait(add_redis_middleware):
+    rate_limiter = add_redis_middleware(RateLimitMiddleware)
+    limit = RateLimit.from_rate("bucket_test", "10/s", burst=2)
+
+    assert [rate_limiter.acquire(limit), rate_limiter.acquire(limit)] == [0, 0]
+    # Empty bucket: the next token is 1 / (10 per second) away
+    assert 0 < rate_limiter.acquire(limit) <= 100
+
+
+def test_bucket_refills_for_elapsed_time(add_redis_middleware):
+    rate_limiter = add_redis_middleware(RateLimitMiddleware)
+    limit = RateLimit.from_rate("refill_test", "10/s", burst=2)
+    for _ in range(2):
+        rate_limiter.acquire(limit)
+
+    # Move the last update 150ms into the past instead of sleeping: one and a half tokens have refilled
+    bucket_key = rate_limiter.keys.rate_limit(limit.key)
+    updated_at = int(rate_limiter.redis_client.hget(bucket_key, "updated_at"))
+    rate_limiter.redis_client.hset(bucket_key, "updated_at", updated_at - 150)
+
+    assert rate_limiter.acquire(limit) == 0
+    assert 0 < rate_limiter.acquire(limit) <= 50
+
+
+def test_empty_bucket_defers_the_message(redis_broker, add_redis_middleware):
+    add_redis_middleware(RateLimitMiddleware, max_inline_wait_ms=0)
+
+    @dramatiq.actor(broker=redis_broker, queue_name="rate_limit_test", rate_limit="1/m", rate_limit_key="defer_test")
+    def limited_task():
+        pass
+
+    redis_broker.emit_before("process_message", limited_task.message())
+    message = limited_task.message()
+    with pytest.raises(SkipMessage):
+        redis_broker.emit_before("process_message", message)
+
+    assert message.options["deferred"] is True
+    [deferred] = delayed_messages(redis_broker, "rate_limit_test")
+    assert deferred.message_id == message.message_id
+    assert (deferred.options["deferred_by"], deferred.options["deferrals"]) == ("rate_limit:defer_test", 1)
+    # Due when the next token is, a minute from now for one token per minute
+    assert deferred.options["eta"] - message.message_timestamp > 50_000
@@ -119,13 +119,8 @@ def start_development_stack():
 
         # 5. Start Dramatiq workers
         print("⚙️  Starting Dramatiq workers...")
-        worker_process = subprocess.Popen([
-            sys.executable, "-m", "dramatiq",
-            "app.tasks.background_tasks",
-            "--watch", "app",
-            "--processes", "1",
-            "--threads", "2"
-        ])
+        # One dramatiq process group per pool in the worker topology
+        worker_process = subprocess.Popen([sys.executable, "run_workers.py", "--watch", "app"])
         processes.append(worker_process)
 
         print("\n✅ Development stack is running!")
@@ -167,7 +162,7 @@ def start_workers_only():
     backend_dir = Path(__file__).parent.parent
     os.chdir(backend_dir)
 
-    os.system("dramatiq app.tasks.background_tasks --watch app --processes 1 --threads 2")
+    os.system(f"{sys.executable} run_workers.py --watch app")
 
 
 actions = {